@@ -1,11 +1,24 @@
-import random
+from collections import Counter, deque
+from graph import SocialCircle
 from reflection import Reflector
 from regulation import Regulator
 from interaction import InteractionHandler
 from post_generation import PostGenerator
 
+RECENT_POSTS = 3  # Own posts quoted in the post prompt
+TOP_POSTS = 3  # Most upvoted own posts quoted in the reflection prompt
+RECENT_UPVOTES = 5  # Upvoted posts quoted in the reflection prompt
+
 class Agent:
-    def __init__(self, node_id: int, llm_model: str, temperature: float, topic: str, role: str, persona: str, regulating: bool, social_circle: set, exploration_prob: float, provides_explanation: bool, debug: bool):
+    # Slots and bounded buffers keep each agent small and flat over any number of generations
+    __slots__ = ("node_id", "llm_model", "temperature", "topic", "role", "persona", "regulating", "regulation_retries",
+                 "regulation_candidates", "reflection_refresh", "decision_mode", "follow_graph", "exploration_prob",
+                 "provides_explanation", "debug", "previous_posts", "top_posts", "received_upvotes", "upvoted_posts", "upvoted_authors",
+                 "current_upvotes", "regulation_passed", "reflection", "reflector", "regulator", "post_generator", "interaction_handler")
+
+    def __init__(self, node_id: int, llm_model: str, temperature: float, topic: str, role: str, persona: str, regulating: bool, follow_graph, exploration_prob: float, provides_explanation: bool, debug: bool,
+                 regulation_retries: int = 3, regulation_candidates: int = 1,
+                 reflection_refresh: int = None, decision_mode: str = "text"):
         self.node_id = node_id
         self.llm_model = llm_model
         self.temperature = temperature
@@ -13,13 +26,22 @@ class Agent:
         self.role = role # VLU or non-VLU
         self.persona = persona 
         self.regulating = regulating
-        self.social_circle = social_circle
+        self.regulation_retries = regulation_retries # Extra generation rounds after every candidate is rejected
+        self.regulation_candidates = regulation_candidates # Candidate posts generated and regulated per round
+        self.reflection_refresh = reflection_refresh # Re-run an unchanged reflection after this many reuses (None = never)
+        self.decision_mode = decision_mode # "text" (parsed DECISIONS:/EXPLANATIONS: reply) or "structured" (constrained decoding)
+        self.follow_graph = follow_graph  # Shared FollowGraph; this agent's row is its social circle
         self.exploration_prob = exploration_prob # Probability of engaging with a post from an non-followed agent
         self.provides_explanation = provides_explanation
         self.debug = debug
 
-        self.previous_posts = [] # Stores (post, upvotes received)
-        self.upvoted_posts = []
+        self.previous_posts = deque(maxlen=RECENT_POSTS) # Latest (post, upvotes received)
+        self.top_posts = [] # Most upvoted (post, upvotes) so far, earlier posts first on ties
+        self.received_upvotes = 0 # Upvotes received over all posts
+        self.upvoted_posts = deque(maxlen=RECENT_UPVOTES) # Latest (post, author) this agent upvoted
+        self.upvoted_authors = Counter() # Upvotes given per author over the whole run
+        self.current_upvotes = []
+        self.regulation_passed = None # Whether the latest post was approved (None when not regulating)
         self.reflection = ""
 
         self.reflector = Reflector(self)
@@ -27,11 +49,29 @@ class Agent:
         self.post_generator = PostGenerator(self)
         self.interaction_handler = InteractionHandler(self)
 
+    @property
+    def social_circle(self) -> SocialCircle:
+        """Agents this agent follows (a set-like view of its row in the shared follow graph)."""
+        return SocialCircle(self.follow_graph, self.node_id)
+
     def create_post(self):
         """Creates a new social media post."""
         return self.post_generator.create_post()
 
-    def interact(self, posts):
-        """Handles interactions with social media content."""
-        return self.interaction_handler.interact(posts)
+    def settle_post(self, post, upvotes) -> None:
+        """Records the upvotes of this generation's post (the latest in `previous_posts`)."""
+        self.previous_posts[-1] = (post, upvotes)
+        self.received_upvotes += upvotes
+        rank = next((idx for idx, (_, top) in enumerate(self.top_posts) if top < upvotes), len(self.top_posts))
+        self.top_posts.insert(rank, (post, upvotes))
+        del self.top_posts[TOP_POSTS:]
+
+    def remember_upvotes(self, upvoted) -> None:
+        """Adds this generation's (post, author) upvotes to the agent's memory."""
+        self.upvoted_posts.extend(upvoted)
+        self.upvoted_authors.update(author for _, author in upvoted)
+
+    def interact(self, followed_posts, explored_posts, batch_size=None):
+        """Decides on social media content; returns (upvoted, unfollowed, followed, explanations) without applying them."""
+        return self.interaction_handler.interact(followed_posts, explored_posts, batch_size)
     
\ No newline at end of file
@@ -1,20 +1,48 @@
-from vis import fused_network_interactive, fused_network_gif
-import streamlit as st
+import os
+from metrics import metrics_path, read_metrics
+
+def analyse_results(output_file, parameters_details, is_streamlit) -> dict:
+    """Runs analysis and visualisation on the simulation results and returns the paths of the artefacts."""
+    # Rendering (matplotlib, gravis) is only imported once there are results to render
+    from vis import GraphSequence, fused_network_interactive, fused_network_gif
 
-def analyse_results(output_file, parameters_details, is_streamlit):
-    """Runs analysis and visualisation on the simulation results."""
     print("Analysing network...")
 
-    html_path = fused_network_interactive(output_file)
-    gif_path = fused_network_gif(output_file, parameters_details)
+    output_format = parameters_details.get("output_format", "json")
+    sequence = GraphSequence(output_file, output_format)  # Parsed once, shared by both renderers
+    html_path = fused_network_interactive(output_file, output_format, sequence)
+    gif_path = fused_network_gif(output_file, parameters_details, output_format, sequence,
+                                 parameters_details.get("frame_workers", 1), parameters_details.get("animation_format", "gif"),
+                                 parameters_details.get("layout_engine", "auto"), parameters_details.get("layout_warm_start", True))
+
+    metrics_file = metrics_path(output_file)
+    artefacts = {"html": html_path, "animation": gif_path, "metrics": metrics_file if os.path.exists(metrics_file) else None}
 
     if is_streamlit:
-        st.write("## Analysis & Visualisation")
+        show_results(artefacts)
+    return artefacts
+
+def show_results(artefacts) -> None:
+    """Displays the artefacts of `analyse_results` in the Streamlit app."""
+    import streamlit as st
+
+    html_path, gif_path, metrics_file = artefacts["html"], artefacts["animation"], artefacts.get("metrics")
+
+    st.write("## Analysis & Visualisation")
+
+    st.write("### Interactive Network Visualisation")
+    with open(html_path, "r", encoding="utf-8") as file:
+        html_code = file.read()
+        st.components.v1.html(html_code, height=800, scrolling=True)
 
-        st.write("### Interactive Network Visualisation")
-        with open(html_path, "r", encoding="utf-8") as file:
-            html_code = file.read()
-            st.components.v1.html(html_code, height=800, scrolling=True)
+    st.write("### Network Evolution GIF")
+    if gif_path.endswith(".mp4"):
+        st.video(gif_path)
+    else:
+        st.image(gif_path,  use_container_width=True)
 
-        st.write("### Network Evolution GIF")
-        st.image(gif_path,  use_container_width=True)
\ No newline at end of file
+    if metrics_file:
+        st.write("### Polarisation & Echo-Chamber Metrics")
+        rows = read_metrics(metrics_file)
+        st.line_chart({metric: [row[metric] for row in rows] for metric in ("homophily", "vlu_assortativity", "mutual_clustering", "upvote_gini")})
+        st.dataframe(rows, use_container_width=True)
\ No newline at end of file
@@ -1,7 +1,7 @@
+import time
 import streamlit as st
-from network import initialise_simulation
-from simulation import run_simulation
-from analysis import analyse_results
+from jobs import JobManager
+from analysis import show_results
 
 is_streamlit = True
 
@@ -10,6 +10,11 @@ st.set_page_config(page_title="Social Media Simulation", layout="wide")
 st.title("📢 FuseNet")
 st.markdown("Configure your simulation parameters and press **Run Simulation**.")
 
+@st.cache_resource
+def job_manager() -> JobManager:
+    """One background worker shared by every session and rerun of the app."""
+    return JobManager()
+
 st.sidebar.header("Simulation Settings")
 
 st.sidebar.markdown("---")
@@ -27,6 +32,11 @@ exploration_prob = st.sidebar.slider("Exploration Probability", 0.0, 1.0, 0.2)
 has_persona = st.sidebar.checkbox("Enable Personas", value=True)
 provides_explanation = st.sidebar.checkbox("Enable Explanation", value=False)
 regulating = st.sidebar.checkbox("Enable Self-Regulation", value=False)
+regulation_candidates = st.sidebar.slider("Candidate Posts per Regulation Round", 1, 5, 1, disabled=not regulating)
+feed_size = st.sidebar.number_input("Feed Size (0 = all posts)", min_value=0, value=0)
+feed_policy = st.sidebar.selectbox("Feed Ranking", ["random", "upvotes", "affinity"])
+decision_mode = st.sidebar.selectbox("Interaction Decisions", ["text", "structured"],
+                                     help="structured: constrained JSON/digit output, one decision per post")
 
 st.sidebar.markdown("---")
 
@@ -49,6 +59,10 @@ st.sidebar.markdown("---")
 
 st.sidebar.subheader("⚡ ADVANCED SETTINGS")
 debug = st.sidebar.checkbox("Enable Debug Mode", value=False)
+seed = st.sidebar.number_input("Random Seed", min_value=0, value=42)
+output_format = st.sidebar.selectbox("Output Format", ["json", "jsonl", "parquet"])
+max_workers = st.sidebar.slider("Concurrent LLM Requests", 1, 32, 8)
+llm_cache = st.sidebar.selectbox("LLM Response Cache", ["off", "read_write", "replay"])
 
 
 
@@ -64,31 +78,52 @@ if st.button("🚀 Run Simulation"):
         "has_persona": has_persona,
         "network_structure": network_structure,
         "regulating": regulating,
+        "regulation_retries": 3,
+        "regulation_candidates": regulation_candidates,
+        "reflection_refresh": None,
+        "decision_mode": decision_mode,
         "connection_prob": connection_prob,
         "k_neighbour": k_neighbour,
         "rewiring_prob": rewiring_prob,
         "VLU_fraction": VLU_fraction,
         "exploration_prob": exploration_prob,
         "provides_explanation": provides_explanation,
-        "debug": debug
+        "debug": debug,
+        "seed": seed,
+        "max_workers": max_workers,
+        "rate_limits": None,
+        "max_retries": 6,
+        "llm_cache": llm_cache,
+        "llm_cache_path": "data/llm_cache.sqlite",
+        "llm_cache_max_mb": 512,
+        "feed_size": feed_size or None,
+        "feed_policy": feed_policy,
+        "feed_batch_size": None,
+        "output_format": output_format,
+        "keyframe_interval": 10,
+        "metrics": True,
+        "checkpoint": True
     }
 
-    agents, initial_social_circle = initialise_simulation(**SIMULATION_CONFIG)
+    # Runs in the background (or loads the cached results of an identical config); widgets stay usable meanwhile
+    st.session_state["job_id"] = job_manager().submit(SIMULATION_CONFIG).id
 
-    output_file = (
-        f"simulation_{SIMULATION_CONFIG['num_agents']}agents_{SIMULATION_CONFIG['generations']}gens_"
-        f"VLU{SIMULATION_CONFIG['VLU_fraction']}VLU_"
-        f"{SIMULATION_CONFIG['llm_model'].replace('.', '_')}_"
-        f"{SIMULATION_CONFIG['network_structure']}_{SIMULATION_CONFIG['topic'].replace(' ', '_')}_"
-        f"explore{SIMULATION_CONFIG['exploration_prob']}_"
-        f"temp{SIMULATION_CONFIG['temperature']}.json"
-    )
+job = job_manager().get(st.session_state["job_id"]) if "job_id" in st.session_state else None
 
-    run_simulation(agents, generations, output_file, initial_social_circle, is_streamlit)
-    
-    st.success("✅ Simulation Completed!")
-    
-    analyse_results(output_file, SIMULATION_CONFIG, is_streamlit)
-    st.info(f"Results saved as `{output_file}`")
+if job is not None and not job.done:
+    st.write("### Running Simulation...")
+    st.progress(job.progress)
+    st.write(f"**{job.message}**")
+    st.caption(f"Job `{job.id}`: changing settings will not interrupt it.")
+    time.sleep(1)
+    st.rerun()  # Poll the job's progress
+
+elif job is not None and job.status == "failed":
+    st.error(f"❌ Simulation failed:\n\n```\n{job.error}\n```")
+
+elif job is not None:
+    st.success("✅ Simulation Completed!" if job.message != "Loaded cached results" else "✅ Loaded cached results for this configuration")
+    show_results(job.artefacts)
+    st.info(f"Results saved as `{job.output_file}`")
 
 st.markdown("Developed by **Edoardo Chidichimo**.")
\ No newline at end of file
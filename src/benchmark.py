@@ -0,0 +1,242 @@
+"""
+Benchmarks how the simulation scales with the offline "stub" LLM.
+
+Usage (from the repository root):
+    python src/benchmark.py                                  # default sweep, prints a table
+    python src/benchmark.py --agents 100 500 --save results/benchmark_baseline.json
+    python src/benchmark.py --compare results/benchmark_baseline.json
+    python src/benchmark.py --imports                        # import-time budget check (exit code 1 if over)
+
+Each configuration runs in a fresh process so peak RSS is measured per run.
+"""
+import argparse
+import contextlib
+import itertools
+import json
+import multiprocessing
+import os
+import resource
+import subprocess
+import sys
+import time
+
+BASE_CONFIG = {
+    "num_agents": 10,
+    "generations": 3,
+    "llm_model": "stub",
+    "temperature": 0.7,
+    "topic": "abortion ban",
+    "has_persona": True,
+    "network_structure": "random",
+    "regulating": False,
+    "connection_prob": 0.3,
+    "k_neighbour": 4,
+    "rewiring_prob": 0.1,
+    "VLU_fraction": 0.5,
+    "exploration_prob": 0.2,
+    "provides_explanation": True,
+    "debug": False,
+    "max_workers": 1,
+    "checkpoint": False,  # Timings cover the simulation only, comparable with baselines from before checkpoints
+    "metrics": False,
+    "stub_llm": {"seed": 0, "latency_mean": 0.0}
+}
+
+PHASES = ("generate_posts", "interact_with_posts", "store_generation_data")
+
+# Modules main.py needs before its first LLM call, and the heavy ones they must not pull in
+STARTUP_MODULES = ("network", "simulation")
+HEAVY_MODULES = ("spacy", "transformers", "torch", "openai", "streamlit", "matplotlib", "gravis", "pyarrow")
+
+def timed(module, name, timings) -> None:
+    """Wraps `module.name` so its cumulative wall time is added to `timings[name]`."""
+    func = getattr(module, name)
+
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
+
+    setattr(module, name, wrapper)
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process (ru_maxrss is KiB on Linux, bytes on macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+def run_case(case) -> dict:
+    """Runs one configuration and returns its measurements (executed in a fresh worker process)."""
+    config, with_vis, keep_output = case
+
+    import random
+    import simulation
+    import utils
+    from network import initialise_simulation
+
+    timings = {}
+    for phase in PHASES:
+        timed(simulation, phase, timings)
+
+    output_file = (
+        f"benchmark_{config['num_agents']}agents_{config['generations']}gens_"
+        f"{config['network_structure']}_explore{config['exploration_prob']}"
+    )
+    output_path = f"data/{output_file}.json"
+
+    random.seed(0)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+        start = time.perf_counter()
+        agents, initial_social_circle = initialise_simulation(config)
+        timings["initialise_simulation"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        simulation.run_simulation(agents, config["generations"], output_file, initial_social_circle, False, config)
+        timings["run_simulation"] = time.perf_counter() - start
+
+        if with_vis:
+            from vis import fused_network_interactive, fused_network_gif
+
+            start = time.perf_counter()
+            fused_network_interactive(output_file)
+            timings["fused_network_interactive"] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            fused_network_gif(output_file, json.dumps(config))
+            timings["fused_network_gif"] = time.perf_counter() - start
+
+    result = {
+        "case": case_name(config),
+        "config": {key: config[key] for key in ("num_agents", "generations", "network_structure", "exploration_prob")},
+        "wall_time_s": {name: round(seconds, 4) for name, seconds in timings.items()},
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "output_bytes": os.path.getsize(output_path),
+        "llm_calls": utils.llm_usage["calls"],
+        "prompt_tokens": utils.llm_usage["prompt_tokens"],
+        "completion_tokens": utils.llm_usage["completion_tokens"],
+    }
+
+    if not keep_output:
+        os.remove(output_path)
+
+    return result
+
+def check_imports(budget, repeats=3) -> bool:
+    """Times a cold import of `STARTUP_MODULES` in fresh interpreters (best of `repeats`).
+
+    Passes if it is within `budget` seconds and none of `HEAVY_MODULES` was loaded on the way.
+    """
+    code = (
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        f"import {', '.join(STARTUP_MODULES)}\n"
+        "seconds = time.perf_counter() - start\n"
+        f"print(json.dumps({{'seconds': seconds, 'heavy': [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))"
+    )
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, (os.path.dirname(os.path.abspath(__file__)), os.environ.get("PYTHONPATH"))))}
+    runs = [json.loads(subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True).stdout)
+            for _ in range(repeats)]
+
+    seconds, heavy = min(run["seconds"] for run in runs), sorted({m for run in runs for m in run["heavy"]})
+    passed = seconds <= budget and not heavy
+    print(f"{'✅' if passed else '❌'} import {', '.join(STARTUP_MODULES)}: {seconds:.3f}s (budget {budget:.3f}s)"
+          f"{', heavy modules loaded: ' + ', '.join(heavy) if heavy else ''}")
+    return passed
+
+def case_name(config) -> str:
+    return (f"{config['num_agents']}agents/{config['generations']}gens/"
+            f"{config['network_structure']}/explore{config['exploration_prob']}")
+
+def expand_cases(args) -> list[dict]:
+    """Builds one config per point of the agents x generations x structure x exploration grid."""
+    cases = []
+    for num_agents, generations, structure, exploration_prob in itertools.product(
+        args.agents, args.generations, args.structures, args.exploration
+    ):
+        config = {**BASE_CONFIG, "num_agents": num_agents, "generations": generations,
+                  "network_structure": structure, "exploration_prob": exploration_prob}
+        config["k_neighbour"] = min(config["k_neighbour"], num_agents - 1)
+        config["stub_llm"] = {**BASE_CONFIG["stub_llm"], "latency_mean": args.latency}
+        cases.append(config)
+    return cases
+
+def compare(results, baseline_path, threshold) -> bool:
+    """Prints per-metric changes against a saved baseline; returns True if any metric regressed."""
+    with open(baseline_path, "r", encoding="utf-8") as file:
+        baseline = {entry["case"]: entry for entry in json.load(file)["results"]}
+
+    def metrics(entry):
+        values = {f"time:{name}": seconds for name, seconds in entry["wall_time_s"].items()}
+        values.update({key: entry[key] for key in ("peak_rss_mb", "output_bytes", "prompt_tokens")})
+        return values
+
+    regressed = False
+    for entry in results:
+        if entry["case"] not in baseline:
+            print(f"{entry['case']}: no baseline")
+            continue
+
+        before, after = metrics(baseline[entry["case"]]), metrics(entry)
+        for name in sorted(after.keys() & before.keys()):
+            if not before[name]:
+                continue
+            change = (after[name] - before[name]) / before[name]
+            flag = ""
+            if change > threshold:
+                flag, regressed = "  <-- regression", True
+            print(f"{entry['case']:<45} {name:<32} {before[name]:>12} -> {after[name]:>12} ({change:+.1%}){flag}")
+
+    return regressed
+
+def print_table(results) -> None:
+    print(f"{'case':<45} {'run_s':>8} {'posts_s':>8} {'interact_s':>10} {'store_s':>8} {'rss_mb':>8} {'out_kb':>9} {'prompt_tok':>11}")
+    for entry in results:
+        times = entry["wall_time_s"]
+        print(
+            f"{entry['case']:<45} {times['run_simulation']:>8.3f} {times.get('generate_posts', 0):>8.3f} "
+            f"{times.get('interact_with_posts', 0):>10.3f} {times.get('store_generation_data', 0):>8.3f} "
+            f"{entry['peak_rss_mb']:>8.1f} {entry['output_bytes'] / 1024:>9.1f} {entry['prompt_tokens']:>11}"
+        )
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark FuseNet scaling with the stub LLM.")
+    parser.add_argument("--agents", type=int, nargs="+", default=[10, 50, 100])
+    parser.add_argument("--generations", type=int, nargs="+", default=[3])
+    parser.add_argument("--structures", nargs="+", default=["random", "small_world", "scale_free", "fully_connected"])
+    parser.add_argument("--exploration", type=float, nargs="+", default=[0.2])
+    parser.add_argument("--latency", type=float, default=0.0, help="Mean stub LLM latency in seconds")
+    parser.add_argument("--vis", action="store_true", help="Also time fused_network_interactive and fused_network_gif")
+    parser.add_argument("--keep-output", action="store_true", help="Keep the simulation output files in data/")
+    parser.add_argument("--save", help="Write the results to this JSON baseline")
+    parser.add_argument("--compare", help="Compare against this JSON baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Relative increase reported as a regression")
+    parser.add_argument("--imports", action="store_true", help="Only check the CLI's startup import time against --import-budget")
+    parser.add_argument("--import-budget", type=float, default=1.0, help="Seconds allowed for the startup imports")
+    args = parser.parse_args()
+
+    if args.imports:
+        sys.exit(0 if check_imports(args.import_budget) else 1)
+
+    cases = [(config, args.vis, args.keep_output) for config in expand_cases(args)]
+
+    results = []
+    context = multiprocessing.get_context("spawn")
+    for case in cases:
+        with context.Pool(1) as pool:  # Fresh process per case so ru_maxrss is not shared between runs
+            results.append(pool.apply(run_case, (case,)))
+        print(f"✅ {results[-1]['case']}: {results[-1]['wall_time_s']['run_simulation']:.3f}s", flush=True)
+
+    print_table(results)
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.save) or ".", exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as file:
+            json.dump({"created": time.strftime("%Y-%m-%d %H:%M:%S"), "results": results}, file, indent=4)
+        print(f"Baseline saved to {args.save}")
+
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+CACHE_MODES = ("off", "read_write", "replay")
+
+class CacheMissError(RuntimeError):
+    """Raised in replay mode when a prompt has no recorded response."""
+
+class ResponseCache:
+    """Content-addressed SQLite store of LLM responses with size-based LRU eviction.
+
+    Modes:
+    - "read_write": serve hits from disk and record every new response
+    - "replay": serve hits only and raise `CacheMissError` on a miss (no API calls)
+    """
+
+    def __init__(self, path, mode="read_write", max_bytes=512 * 1024 ** 2):
+        if mode not in CACHE_MODES[1:]:
+            raise ValueError(f"Cache mode '{mode}' not recognised. Choose from {CACHE_MODES}.")
+
+        self.path = path
+        self.mode = mode
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.occurrences = {}  # Identical prompts within a run get distinct entries (sampled LLMs vary per call)
+        self.deferred = None  # A list collects new responses instead of storing them (shard workers hand them to the coordinator)
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self._db.commit()
+        self._total_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def key(self, llm_model, temperature, system_prompt, context, stream=None) -> str:
+        """Hashes the request together with how often it has been seen in this run (within `stream`, if given)."""
+        request = json.dumps([llm_model, temperature, system_prompt, context], ensure_ascii=False)
+        digest = hashlib.sha256(request.encode("utf-8")).hexdigest()
+        counter = digest if stream is None else f"{stream}:{digest}"
+        with self._lock:
+            occurrence = self.occurrences.get(counter, 0)
+            self.occurrences[counter] = occurrence + 1
+        suffix = occurrence if stream is None else f"{stream}:{occurrence}"
+        return hashlib.sha256(f"{request}#{suffix}".encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Returns the stored response, None on a miss, or raises `CacheMissError` in replay mode."""
+        with self._lock:
+            row = self._db.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+                self._db.commit()
+
+        if row is None and self.mode == "replay":
+            raise CacheMissError(f"No cached response for request {key[:12]} in {self.path}")
+        return row[0] if row else None
+
+    def put(self, key, response) -> None:
+        """Records a response and evicts the least recently used entries beyond `max_bytes`."""
+        if self.deferred is not None:
+            with self._lock:
+                self.deferred.append((key, response))
+            return
+
+        size = len(key) + len(response.encode("utf-8"))
+        with self._lock:
+            previous = self._db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, response, size, time.time())
+            )
+            self._total_bytes += size - (previous[0] if previous else 0)
+
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+            self._db.commit()
+
+    def _evict(self) -> None:
+        """Deletes the oldest entries until the cache is back under 90% of its budget."""
+        target = int(self.max_bytes * 0.9)
+        while self._total_bytes > target:
+            oldest = self._db.execute("SELECT key, size FROM responses ORDER BY last_used LIMIT 1000").fetchall()
+            if not oldest:
+                break
+            for key, size in oldest:
+                if self._total_bytes <= target:
+                    break
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._total_bytes -= size
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,91 @@
+import os
+import pickle
+import random
+from collections import Counter, deque
+from storage import last_generation
+from utils import llm_state, restore_llm_state
+
+CHECKPOINT_VERSION = 2
+
+def checkpoint_path(output_file) -> str:
+    return f"data/{output_file}.ckpt"
+
+def agent_state(agent) -> dict:
+    """The parts of an agent that change during a run (the rest is rebuilt from the config)."""
+    return {
+        "previous_posts": list(agent.previous_posts),
+        "top_posts": agent.top_posts,
+        "received_upvotes": agent.received_upvotes,
+        "upvoted_posts": list(agent.upvoted_posts),
+        "upvoted_authors": dict(agent.upvoted_authors),
+        "reflection": agent.reflection,
+        "regulation_passed": agent.regulation_passed,
+        "reflection_fingerprint": agent.reflector.fingerprint,
+        "reflection_reused": agent.reflector.reused,
+    }
+
+def restore_agent_state(agent, state) -> None:
+    agent.previous_posts = deque(state["previous_posts"], maxlen=agent.previous_posts.maxlen)
+    agent.top_posts = list(state["top_posts"])
+    agent.received_upvotes = state["received_upvotes"]
+    agent.upvoted_posts = deque(state["upvoted_posts"], maxlen=agent.upvoted_posts.maxlen)
+    agent.upvoted_authors = Counter(state["upvoted_authors"])
+    agent.reflection = state["reflection"]
+    agent.regulation_passed = state.get("regulation_passed")
+    agent.reflector.fingerprint = state["reflection_fingerprint"]
+    agent.reflector.reused = state["reflection_reused"]
+
+def save_checkpoint(output_file, generation, agents, follow_graph, writer, config, seed) -> None:
+    """Records everything needed to continue after `generation` completed generations.
+
+    The file is written to a temporary path and renamed, so a crash mid-write leaves the
+    previous checkpoint intact.
+    """
+    follow_graph.compact()
+    state = {
+        "version": CHECKPOINT_VERSION,
+        "generation": generation,
+        "config": config,
+        "seed": seed,
+        "random_state": random.getstate(),
+        "llm_state": llm_state(),
+        "agents": {node: agent_state(agent) for node, agent in agents.items()},
+        "follow_graph": (follow_graph.indptr, follow_graph.indices),
+        "output_offset": writer.offset(),
+    }
+
+    path = checkpoint_path(output_file)
+    with open(f"{path}.tmp", "wb") as file:
+        pickle.dump(state, file, protocol=pickle.HIGHEST_PROTOCOL)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(f"{path}.tmp", path)
+
+def load_checkpoint(output_file) -> dict:
+    with open(checkpoint_path(output_file), "rb") as file:
+        state = pickle.load(file)
+    if state.get("version") != CHECKPOINT_VERSION:
+        raise ValueError(f"Checkpoint for {output_file} has version {state.get('version')}, expected {CHECKPOINT_VERSION}.")
+    return state
+
+def run_status(config, output_file) -> str:
+    """"completed", "resume" (checkpoint of an unfinished run) or "new".
+
+    A run only counts as completed if its output is closed and holds the last generation; a final
+    checkpoint whose output was never closed (killed before `writer.close()`) is resumed to close it.
+    """
+    generation = last_generation(output_file, config.get("output_format", "json"))
+    if generation is not None and generation >= config["generations"]:
+        return "completed"
+    return "resume" if os.path.exists(checkpoint_path(output_file)) else "new"
+
+def restore_checkpoint(agents, checkpoint) -> None:
+    """Puts freshly initialised agents, their follow graph and the RNG/LLM counters back in the checkpointed state."""
+    for node, state in checkpoint["agents"].items():
+        restore_agent_state(agents[node], state)
+
+    follow_graph = next(iter(agents.values())).follow_graph
+    follow_graph.indptr, follow_graph.indices = checkpoint["follow_graph"]
+
+    random.setstate(checkpoint["random_state"])
+    restore_llm_state(checkpoint["llm_state"])
\ No newline at end of file
@@ -0,0 +1,130 @@
+import numpy as np
+
+def feed_statistics(agents, post_list) -> dict:
+    """Per-generation author statistics shared by every agent's ranking policy (computed once)."""
+    return {
+        "position": {author: idx for idx, (author, _) in enumerate(post_list)},
+        "author_upvotes": {author: agents[author].received_upvotes for author, _ in post_list},
+    }
+
+def rank_uniformly(agent, author_id, stats, affinity) -> float:
+    """No preference: every post of a generation is equally recent, so the seeded tie-break decides."""
+    return 0.0
+
+def rank_by_prior_upvotes(agent, author_id, stats, affinity) -> float:
+    """Authors whose earlier posts collected the most upvotes first."""
+    return stats["author_upvotes"][author_id]
+
+def rank_by_author_affinity(agent, author_id, stats, affinity) -> float:
+    """Authors this agent has upvoted most often first."""
+    return affinity[author_id]
+
+RANKING_POLICIES = {
+    "random": rank_uniformly,
+    "upvotes": rank_by_prior_upvotes,
+    "affinity": rank_by_author_affinity,
+}
+RENAMED_POLICIES = {"recency": "random"}  # Older configs and checkpoints
+
+def sample_exposures(agents, follow_graph, post_list, stats, rng, max_exposures=None) -> tuple[np.ndarray, np.ndarray]:
+    """Draws, in bulk, which non-followed posts each agent comes across this generation.
+
+    Every agent sees each post from a non-followed author with probability `exploration_prob`:
+    its number of exposures is Binomial(#non-followed posts, p) and the posts themselves are
+    distinct ranks drawn uniformly within its non-followed set. All agents are handled with a
+    few NumPy passes, and the same `rng` seed reproduces every agent's exposures. `max_exposures`
+    keeps a uniform subset of at most that many per agent (no feed can hold more).
+    Returns flat exposed positions in `post_list` and offsets: the i-th agent's posts (in post order)
+    are `positions[offsets[i]:offsets[i + 1]]`.
+    """
+    num_posts, nodes = len(post_list), list(agents)
+    node_ids = np.fromiter(nodes, dtype=np.int64, count=len(nodes))
+
+    post_position = np.full(follow_graph.num_nodes, -1, dtype=np.int64)
+    post_position[[author for author, _ in post_list]] = np.arange(num_posts)
+
+    # Positions an agent cannot explore: posts by authors it already follows and its own post
+    follow_graph.compact()
+    row_lengths = np.diff(follow_graph.indptr)[node_ids]
+    row_owner = np.repeat(np.arange(len(nodes)), row_lengths)
+    row_offset = np.arange(len(row_owner)) - np.repeat(np.cumsum(row_lengths) - row_lengths, row_lengths)
+    followed = follow_graph.indices[np.repeat(follow_graph.indptr[node_ids], row_lengths) + row_offset]
+
+    owners = np.concatenate((row_owner, np.arange(len(nodes))))
+    positions = post_position[np.concatenate((followed, node_ids))]
+    excluded_keys = np.sort(owners[positions >= 0] * (num_posts + 1) + positions[positions >= 0])
+    excluded_keys = excluded_keys[np.concatenate(([True], excluded_keys[1:] != excluded_keys[:-1]))]
+    excluded_owner, flat_excluded = excluded_keys // (num_posts + 1), excluded_keys % (num_posts + 1)
+    excluded_counts = np.bincount(excluded_owner, minlength=len(nodes))
+    sizes = num_posts - excluded_counts
+
+    probs = np.array([agents[node].exploration_prob for node in nodes], dtype=float)
+    counts = rng.binomial(sizes, probs)
+    if max_exposures is not None:
+        counts = np.minimum(counts, max_exposures)
+
+    owner = np.repeat(np.arange(len(nodes)), counts)
+    ranks = _distinct_ranks(rng, owner, sizes[owner], num_posts)
+
+    # The r-th non-excluded position is r + #{j : excluded_j - j <= r} (per agent, on sorted keys)
+    starts = np.concatenate(([0], np.cumsum(excluded_counts)[:-1]))
+    shifted = (flat_excluded - (np.arange(len(flat_excluded)) - starts[excluded_owner])) + excluded_owner * (num_posts + 1)
+    skipped = np.searchsorted(shifted, owner * (num_posts + 1) + ranks, side="right") - starts[owner]
+    positions = ranks + skipped
+
+    positions = np.sort(owner * num_posts + positions) - owner * num_posts  # Post order within each agent
+    return positions, np.concatenate(([0], np.cumsum(counts)))
+
+def _distinct_ranks(rng, owner, sizes, num_posts, max_rounds=32) -> np.ndarray:
+    """Draws one rank in [0, size) per entry, distinct within each owner."""
+    ranks = np.floor(rng.random(len(owner)) * sizes).astype(np.int64)
+    for _ in range(max_rounds):
+        _, first = np.unique(owner * num_posts + ranks, return_index=True)
+        duplicate = np.ones(len(ranks), dtype=bool)
+        duplicate[first] = False
+        if not duplicate.any():
+            return ranks
+        ranks[duplicate] = np.floor(rng.random(int(duplicate.sum())) * sizes[duplicate]).astype(np.int64)
+
+    # Near-saturated owners (exploration_prob close to 1): draw their ranks without replacement directly
+    for agent_idx in np.unique(owner[duplicate]):
+        entries = np.flatnonzero(owner == agent_idx)
+        ranks[entries] = rng.choice(sizes[entries[0]], size=len(entries), replace=False)
+    return ranks
+
+def build_feed(agent, post_list, stats, explored_positions, feed_size=None, policy="random", rng=None) -> tuple[list[tuple[int, str]], list[tuple[int, str]]]:
+    """Selects the posts an agent sees: every followed author's post plus its sampled explored posts.
+
+    With `feed_size` set, only the top `feed_size` posts under the ranking `policy` are kept,
+    so the prompt size per agent stays constant as the network grows. Ties are broken by a draw
+    from `rng` rather than by post order, which is node-id order and would favour the same authors.
+    """
+    policy = RENAMED_POLICIES.get(policy, policy)
+    if policy not in RANKING_POLICIES:
+        raise ValueError(f"Feed policy '{policy}' not recognised. Choose from {list(RANKING_POLICIES)}.")
+
+    position = stats["position"]
+    followed_positions = sorted(position[author] for author in agent.social_circle if author in position and author != agent.node_id)
+    followed_posts = [post_list[idx] for idx in followed_positions]
+    explored_posts = [post_list[idx] for idx in explored_positions]
+
+    if feed_size is None or len(followed_posts) + len(explored_posts) <= feed_size:
+        return followed_posts, explored_posts
+
+    rank = RANKING_POLICIES[policy]
+    affinity = agent.upvoted_authors
+    candidates = [(post, True) for post in followed_posts] + [(post, False) for post in explored_posts]
+    tiebreak = (rng or np.random.default_rng()).random(len(candidates))
+    order = sorted(range(len(candidates)), key=lambda idx: (rank(agent, candidates[idx][0][0], stats, affinity), tiebreak[idx]),
+                   reverse=True)
+
+    kept = [candidates[idx] for idx in order[:feed_size]]
+    return [post for post, followed in kept if followed], [post for post, followed in kept if not followed]
+
+def batched(posts, batch_size=None) -> list[list[tuple[int, str]]]:
+    """Splits a feed into prompts of at most `batch_size` posts (one prompt if None)."""
+    if not posts:
+        return []
+    if not batch_size:
+        return [posts]
+    return [posts[i:i + batch_size] for i in range(0, len(posts), batch_size)]
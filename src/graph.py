@@ -0,0 +1,154 @@
+import numpy as np
+
+class FollowGraph:
+    """Directed follow graph shared by all agents: CSR arrays plus a buffer of pending edits.
+
+    Row `src` of the CSR holds the (sorted) agents that `src` follows. Follows and unfollows are
+    buffered per source and folded into the arrays in one vectorised pass by `compact()`, so
+    bulk queries (degrees, mutual follows, snapshots) cost O(edges) NumPy work.
+    """
+
+    def __init__(self, num_nodes, indptr=None, indices=None):
+        self.num_nodes = num_nodes
+        self.indptr = np.zeros(num_nodes + 1, dtype=np.int64) if indptr is None else np.asarray(indptr, dtype=np.int64)
+        self.indices = np.zeros(0, dtype=np.int64) if indices is None else np.asarray(indices, dtype=np.int64)
+        self._pending = {}  # src -> {dst: True (follow) / False (unfollow)}, last edit wins
+
+    @classmethod
+    def from_adjacency(cls, num_nodes, adjacency) -> "FollowGraph":
+        """Builds a graph from {node: iterable of followed nodes}."""
+        adjacency = {node: list(followed) for node, followed in adjacency.items()}
+        src = np.fromiter((node for node, followed in adjacency.items() for _ in followed), dtype=np.int64)
+        dst = np.fromiter((target for followed in adjacency.values() for target in followed), dtype=np.int64)
+        return cls.from_edges(num_nodes, src, dst)
+
+    @classmethod
+    def from_edges(cls, num_nodes, src, dst) -> "FollowGraph":
+        """Builds a graph from parallel arrays of follower and followed ids."""
+        keys = np.unique(np.asarray(src, dtype=np.int64) * num_nodes + np.asarray(dst, dtype=np.int64))
+        return cls._from_keys(num_nodes, keys)
+
+    @classmethod
+    def _from_keys(cls, num_nodes, keys) -> "FollowGraph":
+        indptr = np.concatenate(([0], np.cumsum(np.bincount(keys // num_nodes, minlength=num_nodes))))
+        return cls(num_nodes, indptr, keys % num_nodes)
+
+    # --- Edits (buffered) ---
+
+    def follow(self, src, targets) -> None:
+        row = self._pending.setdefault(src, {})
+        for dst in targets:
+            if dst != src:
+                row[int(dst)] = True
+
+    def unfollow(self, src, targets) -> None:
+        row = self._pending.setdefault(src, {})
+        for dst in targets:
+            row[int(dst)] = False
+
+    def apply_edits(self, src, dst, follow) -> None:
+        """Bulk edit from parallel arrays: `follow[i]` True adds src[i] -> dst[i], False removes it."""
+        for s, d, f in zip(np.asarray(src).tolist(), np.asarray(dst).tolist(), np.asarray(follow).tolist()):
+            if s != d or not f:
+                self._pending.setdefault(s, {})[d] = bool(f)
+
+    def compact(self) -> None:
+        """Folds the pending edits into the CSR arrays."""
+        if not self._pending:
+            return
+
+        edits = [(src * self.num_nodes + dst, add) for src, row in self._pending.items() for dst, add in row.items()]
+        keys = np.fromiter((key for key, _ in edits), dtype=np.int64, count=len(edits))
+        adds = np.fromiter((add for _, add in edits), dtype=bool, count=len(edits))
+
+        current = self.edge_keys(compact=False)
+        current = current[~np.isin(current, keys[~adds])]
+        merged = np.union1d(current, keys[adds])
+
+        compacted = self._from_keys(self.num_nodes, merged)
+        self.indptr, self.indices = compacted.indptr, compacted.indices
+        self._pending = {}
+
+    # --- Queries ---
+
+    def successors(self, node) -> list[int]:
+        """Sorted ids followed by `node`, including pending edits."""
+        row = self.indices[self.indptr[node]:self.indptr[node + 1]].tolist()
+        pending = self._pending.get(node)
+        if not pending:
+            return row
+        followed = set(row)
+        for dst, add in pending.items():
+            if add:
+                followed.add(dst)
+            else:
+                followed.discard(dst)
+        return sorted(followed)
+
+    def has_edge(self, src, dst) -> bool:
+        pending = self._pending.get(src)
+        if pending and dst in pending:
+            return pending[dst]
+        row = self.indices[self.indptr[src]:self.indptr[src + 1]]
+        idx = np.searchsorted(row, dst)
+        return bool(idx < len(row) and row[idx] == dst)
+
+    def edge_keys(self, compact=True) -> np.ndarray:
+        """Sorted `src * num_nodes + dst` keys of every edge."""
+        if compact:
+            self.compact()
+        sources = np.repeat(np.arange(self.num_nodes, dtype=np.int64), np.diff(self.indptr))
+        return sources * self.num_nodes + self.indices
+
+    def edges(self) -> tuple[np.ndarray, np.ndarray]:
+        """Parallel (src, dst) arrays of every edge."""
+        keys = self.edge_keys()
+        return keys // self.num_nodes, keys % self.num_nodes
+
+    def out_degree(self) -> np.ndarray:
+        self.compact()
+        return np.diff(self.indptr)
+
+    def in_degree(self) -> np.ndarray:
+        self.compact()
+        return np.bincount(self.indices, minlength=self.num_nodes)
+
+    def mutual_edges(self) -> np.ndarray:
+        """(k, 2) array of undirected pairs (u < v) that follow each other."""
+        keys = self.edge_keys()
+        src, dst = keys // self.num_nodes, keys % self.num_nodes
+        lower = src < dst
+        reverse = dst[lower] * self.num_nodes + src[lower]
+        idx = np.minimum(np.searchsorted(keys, reverse), max(len(keys) - 1, 0))
+        mutual = keys[idx] == reverse if len(keys) else np.zeros(0, dtype=bool)
+        return np.column_stack((src[lower][mutual], dst[lower][mutual]))
+
+    def to_lists(self) -> list[list[int]]:
+        """Followed ids per node, e.g. for JSON snapshots."""
+        self.compact()
+        flat, bounds = self.indices.tolist(), self.indptr.tolist()
+        return [flat[bounds[node]:bounds[node + 1]] for node in range(self.num_nodes)]
+
+class SocialCircle:
+    """Set-like view of one agent's row in the shared `FollowGraph`."""
+
+    __slots__ = ("graph", "node")
+
+    def __init__(self, graph, node):
+        self.graph = graph
+        self.node = node
+
+    def __contains__(self, other) -> bool:
+        return self.graph.has_edge(self.node, other)
+
+    def __iter__(self):
+        return iter(self.graph.successors(self.node))
+
+    def __len__(self) -> int:
+        return len(self.graph.successors(self.node))
+
+    def update(self, targets) -> None:
+        self.graph.follow(self.node, targets)
+
+    def difference_update(self, targets) -> None:
+        self.graph.unfollow(self.node, targets)
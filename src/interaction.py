@@ -1,5 +1,5 @@
-from utils import generate_llm_response
-import random
+from utils import generate_llm_decisions, generate_llm_response
+from feed import batched
 
 def retrieve_decisions_and_explanations(llm_response: str, contains_explanations: bool, mapping: dict) -> tuple[list[int], dict[int, str]]:
     """Extracts decisions and explanations from the LLM response."""
@@ -37,6 +37,8 @@ def check_decisions(decisions, message_list) -> list[int]:
     
 
 class InteractionHandler:
+    __slots__ = ("agent",)
+
     def __init__(self, agent):
         self.agent = agent
 
@@ -47,6 +49,14 @@ class InteractionHandler:
 
         message_list = "\n".join([f"{idx}: {msg}" for idx, (_, msg) in enumerate(messages)])
 
+        if self.agent.decision_mode == "structured":
+            # One constrained decision per post: nothing to parse, pad or truncate
+            context = f"{context_intro}\nDecide on every post below by its number.\nPosts:\n{message_list}"
+            decisions, explanations = generate_llm_decisions(context, self.agent.llm_model, self.agent.temperature,
+                                                             len(messages), [0, *decision_mapping], self.agent.provides_explanation)
+            explanations = {mapping[idx][1]: explanation for idx, explanation in explanations.items()}
+            return (*self.apply_decisions(decisions, mapping, decision_mapping), explanations)
+
         # Construct context for LLM prompt
         context = f"{context_intro}\n"
         context += "Return responses in the format:\nDECISIONS:\n0,1,2,3,1\n"
@@ -60,7 +70,9 @@ class InteractionHandler:
         returned_decisions, explanations = retrieve_decisions_and_explanations(llm_response, self.agent.provides_explanation, mapping)
         decisions = check_decisions(returned_decisions, messages)
 
-        # Apply decisions
+        return (*self.apply_decisions(decisions, mapping, decision_mapping), explanations)
+
+    def apply_decisions(self, decisions, mapping, decision_mapping) -> tuple[list[tuple[str, int]], set[int]]:
         results = {1: [], 2: set(), 3: ([], set())}
 
         for idx, decision in enumerate(decisions):
@@ -68,7 +80,7 @@ class InteractionHandler:
             if decision in decision_mapping:
                 decision_mapping[decision](results, message, author_id)
 
-        return results[1], results[2], explanations  # Unpack upvoted, removed, explanations
+        return results[1], results[2]  # Upvoted, removed/followed
 
     def process_followed_posts(self, followed_messages, followed_mapping) -> tuple[list[tuple[str, int]], list[int], dict[int, str]]:
         """Handles decision-making for followed posts."""
@@ -95,38 +107,33 @@ class InteractionHandler:
             context_intro=f"My social media style summary:\n{self.agent.reflection}\nThese are posts from users you do not follow. Choose for each post:\n0: Ignore\n1: Upvote\n2: Follow\n3: Upvote & Follow"
         )
 
-    def interact(self, messages) -> tuple[list[tuple[str, int]], list[int], dict[int, str]]:
-
-        # Step 1: Filter messages into followed and non-followed posts
-        followed_messages = []
-        non_followed_messages = []
-        followed_mapping = {}
-        non_followed_mapping = {}
-
-        for author, msg in messages:
-            if author == self.agent.node_id:
-                continue  # Skip self-posts
-
-            if author in self.agent.social_circle:
-                followed_mapping[len(followed_messages)] = (author, msg)
-                followed_messages.append((author, msg))
-            elif random.uniform(0, 1) < self.agent.exploration_prob: # % chance of seeing a non-followed post
-                non_followed_mapping[len(non_followed_messages)] = (author, msg)
-                non_followed_messages.append((author, msg))
-
-        # Step 2: Regular interaction with followed posts
-        upvoted_messages, removed_agents, followed_explanations = self.process_followed_posts(followed_messages, followed_mapping)
-        
-        # Step 3: Interaction with non-followed posts
-        new_followed, extra_upvoted, non_followed_explanations = self.explore_posts(non_followed_messages, non_followed_mapping)
-
-        self.agent.social_circle.update(
-            {agent_id for agent_id in new_followed if isinstance(agent_id, int)}
-        )
-
-        all_explanations = {**followed_explanations, **non_followed_explanations}
+    def interact(self, followed_posts, explored_posts, batch_size=None) -> tuple[list[tuple[str, int]], list[int], list[int], dict[int, str]]:
+        """Decides on a feed of followed and explored posts, one prompt per batch of at most `batch_size` posts.
+
+        Nothing is changed on the agent: the upvotes, unfollowed and newly followed agents are returned
+        for `processing.interact_with_posts` to apply, so agents can decide concurrently.
+        """
+        upvoted_messages, removed_agents, new_followed, extra_upvoted = [], set(), set(), []
+        all_explanations = {}
+
+        # Step 1: Regular interaction with followed posts
+        for batch in batched(followed_posts, batch_size):
+            mapping = dict(enumerate(batch))
+            upvoted, removed, explanations = self.process_followed_posts(batch, mapping)
+            upvoted_messages.extend(upvoted)
+            removed_agents.update(removed)
+            all_explanations.update(explanations)
+
+        # Step 2: Interaction with non-followed posts
+        for batch in batched(explored_posts, batch_size):
+            mapping = dict(enumerate(batch))
+            upvoted, followed, explanations = self.explore_posts(batch, mapping)
+            extra_upvoted.extend(upvoted)
+            new_followed.update(followed)
+            all_explanations.update(explanations)
 
         upvoted_messages = [(msg, auth) for item in upvoted_messages if isinstance(item, tuple) and len(item) == 2 for msg, auth in [item]]
         extra_upvoted = [(msg, auth) for item in extra_upvoted if isinstance(item, tuple) and len(item) == 2 for msg, auth in [item]]
 
-        return upvoted_messages + extra_upvoted, list(removed_agents), all_explanations
\ No newline at end of file
+        new_followed = sorted(agent_id for agent_id in new_followed if isinstance(agent_id, int))
+        return upvoted_messages + extra_upvoted, sorted(removed_agents), new_followed, all_explanations
\ No newline at end of file
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+JOBS_DIR = "data/jobs"
+
+def config_hash(config) -> str:
+    """Short, stable ID of a simulation config (key order does not matter)."""
+    return hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+class Job:
+    """A simulation submitted to the `JobManager`, updated by its worker thread and polled by the UI."""
+
+    def __init__(self, job_id, config, output_file):
+        self.id = job_id
+        self.config = config
+        self.output_file = output_file
+        self.status = "queued"  # "queued", "running", "completed" or "failed"
+        self.progress = 0.0
+        self.message = "Waiting for a worker..."
+        self.artefacts = {}  # Paths returned by `analyse_results`
+        self.error = None
+        self.submitted = time.time()
+        self.finished = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("completed", "failed")
+
+    def to_dict(self) -> dict:
+        return {"id": self.id, "config": self.config, "output_file": self.output_file, "status": self.status,
+                "artefacts": self.artefacts, "error": self.error, "submitted": self.submitted, "finished": self.finished}
+
+class JobManager:
+    """Runs simulations and their analysis off the Streamlit script thread.
+
+    Jobs are keyed by `config_hash`: submitting a config that is already queued or running returns
+    that job, and one that finished earlier (in this or a previous session) is loaded from
+    data/jobs/<id>.json without recomputing, as long as its artefacts still exist. Jobs run one at
+    a time because the LLM cache and stub are configured per process; each run still issues
+    `max_workers` concurrent LLM calls. A run interrupted by a restart resumes from its checkpoint.
+    """
+
+    def __init__(self, max_workers=1, jobs_dir=JOBS_DIR):
+        self.jobs_dir = jobs_dir
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fusenet-job")
+        os.makedirs(jobs_dir, exist_ok=True)
+
+    def submit(self, config) -> Job:
+        job_id = config_hash(config)
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is not None and job.status != "failed":
+                return job
+
+            job = self.load(job_id)
+            if job is None:
+                from simulation import output_filename
+                job = Job(job_id, dict(config), output_filename(config, tag=job_id))
+                self.executor.submit(self.run, job)
+            self.jobs[job_id] = job
+            return job
+
+    def get(self, job_id) -> Job:
+        with self.lock:
+            return self.jobs.get(job_id) or self.load(job_id)
+
+    def load(self, job_id) -> Job:
+        """A completed job recorded on disk whose artefacts are all still present, or None."""
+        path = os.path.join(self.jobs_dir, f"{job_id}.json")
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as file:
+            record = json.load(file)
+        if record["status"] != "completed" or not all(os.path.exists(p) for p in record["artefacts"].values() if p):
+            return None
+
+        job = Job(record["id"], record["config"], record["output_file"])
+        job.status, job.progress, job.message = "completed", 1.0, "Loaded cached results"
+        job.artefacts, job.submitted, job.finished = record["artefacts"], record["submitted"], record["finished"]
+        return job
+
+    def save(self, job) -> None:
+        path = os.path.join(self.jobs_dir, f"{job.id}.json")
+        with open(f"{path}.tmp", "w", encoding="utf-8") as file:
+            json.dump(job.to_dict(), file, indent=4)
+        os.replace(f"{path}.tmp", path)
+
+    def run(self, job) -> None:
+        from analysis import analyse_results
+        from checkpoint import run_status
+        from network import initialise_simulation
+        from simulation import resume_simulation, run_simulation
+
+        def report(step, total, message):
+            job.progress = 0.9 * step / total  # The last tenth is the analysis
+            job.message = message
+
+        job.status = "running"
+        try:
+            status = run_status(job.config, job.output_file)  # "completed" when only the artefacts went missing
+            if status == "resume":
+                resume_simulation(job.output_file, job.config["generations"], progress_callback=report)
+            elif status == "new":
+                agents, initial_social_circle = initialise_simulation(job.config)
+                run_simulation(agents, job.config["generations"], job.output_file, initial_social_circle,
+                               False, job.config, progress_callback=report)
+
+            job.message = "Rendering visualisations..."
+            job.artefacts = analyse_results(job.output_file, job.config, False)
+            job.status, job.progress, job.message = "completed", 1.0, "Simulation completed"
+        except Exception as error:
+            job.status, job.message = "failed", "Simulation failed"
+            job.error = f"{type(error).__name__}: {error}\n{traceback.format_exc()}"
+        finally:
+            job.finished = time.time()
+            self.save(job)
\ No newline at end of file
@@ -0,0 +1,164 @@
+import hashlib
+import os
+import networkx as nx
+import numpy as np
+
+def _nx_graph(num_nodes, edges) -> nx.Graph:
+    G = nx.Graph()
+    G.add_nodes_from(range(num_nodes))
+    G.add_edges_from(edges.tolist())
+    return G
+
+def _as_array(pos, num_nodes) -> np.ndarray:
+    return np.array([pos[node] for node in range(num_nodes)], dtype=float).reshape(num_nodes, 2)
+
+def kamada_kawai_layout(num_nodes, edges, positions=None, iterations=None, seed=42) -> np.ndarray:
+    """networkx's Kamada–Kawai (roughly cubic in the number of nodes: small populations only)."""
+    pos = None if positions is None else dict(enumerate(positions))
+    return _as_array(nx.kamada_kawai_layout(_nx_graph(num_nodes, edges), pos=pos), num_nodes)
+
+def spring_layout(num_nodes, edges, positions=None, iterations=50, seed=42) -> np.ndarray:
+    """networkx's Fruchterman–Reingold (exact O(n^2) repulsion)."""
+    pos = None if positions is None else dict(enumerate(positions))
+    return _as_array(nx.spring_layout(_nx_graph(num_nodes, edges), pos=pos, iterations=iterations or 50, seed=seed), num_nodes)
+
+def force_directed_layout(num_nodes, edges, positions=None, iterations=None, seed=42) -> np.ndarray:
+    """NumPy Fruchterman–Reingold with grid-approximated repulsion, for thousands of nodes.
+
+    Nodes are binned into a grid of cells about two ideal edge lengths wide. Repulsion from the
+    3x3 block of cells around a node is computed exactly; every other cell acts as a single
+    body at its centroid. Starting from `positions` (a previous generation's layout) it runs
+    fewer, cooler iterations so the picture only moves where the edges changed.
+    Returns positions in [-1, 1].
+    """
+    if num_nodes == 0:
+        return np.zeros((0, 2))
+
+    rng = np.random.default_rng(seed)
+    warm = positions is not None
+    X = (np.asarray(positions, dtype=float) + 1) / 2 if warm else rng.random((num_nodes, 2))
+    iterations = iterations or (15 if warm else 80)
+    temperature = 0.02 if warm else 0.1
+
+    k = np.sqrt(1.0 / num_nodes)  # Ideal edge length in the unit square
+    grid = int(np.clip(np.ceil(1 / (2 * k)), 1, 64))
+    edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+
+    for step in range(iterations):
+        displacement = _grid_repulsion(X, k, grid)
+
+        if len(edges):  # Attraction d^2 / k along every edge
+            delta = X[edges[:, 1]] - X[edges[:, 0]]
+            pull = delta * np.linalg.norm(delta, axis=1, keepdims=True) / k
+            for dim in range(2):
+                displacement[:, dim] += np.bincount(edges[:, 0], pull[:, dim], num_nodes) - np.bincount(edges[:, 1], pull[:, dim], num_nodes)
+
+        length = np.maximum(np.linalg.norm(displacement, axis=1, keepdims=True), 1e-9)
+        limit = temperature * (1 - step / iterations)
+        X = np.clip(X + displacement / length * np.minimum(length, limit), 0, 1)
+
+    return X * 2 - 1
+
+def _grid_repulsion(X, k, grid, chunk=1024) -> np.ndarray:
+    """Repulsive displacement k^2 / d per node (exact for neighbouring cells, centroids beyond)."""
+    num_nodes = len(X)
+    cell_xy = np.minimum((X * grid).astype(np.int64), grid - 1)
+    cell = cell_xy[:, 0] * grid + cell_xy[:, 1]
+    num_cells = grid * grid
+
+    mass = np.bincount(cell, minlength=num_cells).astype(float)
+    centroid = np.column_stack([np.bincount(cell, weights=X[:, dim], minlength=num_cells) for dim in range(2)])
+    centroid /= np.maximum(mass, 1)[:, None]
+
+    displacement = np.zeros_like(X)
+    k2 = k * k
+
+    # Far field: every cell's centroid, minus the node's own 3x3 block (handled exactly below)
+    occupied = np.flatnonzero(mass)
+    cx, cy = occupied // grid, occupied % grid
+    centres, weights = centroid[occupied], k2 * mass[occupied]
+    for start in range(0, num_nodes, chunk):
+        rows = slice(start, start + chunk)
+        # sum_c w_ic (x_i - c_c) = x_i * sum_c w_ic - W @ c, with w_ic = k^2 m_c / d_ic^2 for far cells
+        dist2 = np.maximum((X[rows] ** 2).sum(axis=1)[:, None] + (centres ** 2).sum(axis=1)[None, :] - 2 * X[rows] @ centres.T, 1e-6)
+        far = (np.abs(cx[None, :] - cell_xy[rows, 0, None]) > 1) | (np.abs(cy[None, :] - cell_xy[rows, 1, None]) > 1)
+        W = weights * far / dist2
+        displacement[rows] = X[rows] * W.sum(axis=1)[:, None] - W @ centres
+
+    # Near field: exact pairs between each node and the members of its 3x3 block
+    order = np.argsort(cell, kind="stable")
+    starts = np.concatenate(([0], np.cumsum(mass.astype(np.int64))[:-1]))
+    counts = mass.astype(np.int64)
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            nx_, ny_ = cell_xy[:, 0] + dx, cell_xy[:, 1] + dy
+            valid = (nx_ >= 0) & (nx_ < grid) & (ny_ >= 0) & (ny_ < grid)
+            nodes = np.flatnonzero(valid)
+            neighbour = nx_[nodes] * grid + ny_[nodes]
+            per_node = counts[neighbour]
+            i = np.repeat(nodes, per_node)
+            offset = np.arange(len(i)) - np.repeat(np.cumsum(per_node) - per_node, per_node)
+            j = order[np.repeat(starts[neighbour], per_node) + offset]
+            distinct = i != j
+            i, j = i[distinct], j[distinct]
+
+            delta = X[i] - X[j]
+            dist2 = np.maximum((delta ** 2).sum(axis=1), 1e-6)
+            for dim in range(2):
+                displacement[:, dim] += np.bincount(i, delta[:, dim] * k2 / dist2, num_nodes)
+
+    return displacement
+
+LAYOUT_ENGINES = {
+    "kamada_kawai": kamada_kawai_layout,
+    "spring": spring_layout,
+    "force": force_directed_layout,
+}
+
+def resolve_engine(engine, num_nodes) -> str:
+    """"auto" keeps Kamada–Kawai for small populations and switches to the grid force layout beyond 200 agents."""
+    if engine == "auto":
+        return "kamada_kawai" if num_nodes <= 200 else "force"
+    if engine not in LAYOUT_ENGINES:
+        raise ValueError(f"Layout engine '{engine}' not recognised. Choose from {['auto', *LAYOUT_ENGINES]}.")
+    return engine
+
+def compute_layouts(num_nodes, edges_by_generation, engine="auto", warm_start=True, seed=42) -> np.ndarray:
+    """(generations, num_nodes, 2) positions for edges given as node indices.
+
+    With `warm_start` each generation starts from the previous generation's positions; otherwise
+    one layout of the union of all generations' edges is used for every frame.
+    """
+    layout = LAYOUT_ENGINES[resolve_engine(engine, num_nodes)]
+
+    if not warm_start:
+        union = np.unique(np.concatenate([edges.reshape(-1, 2) for edges in edges_by_generation] or [np.zeros((0, 2), dtype=np.int64)]), axis=0)
+        positions = layout(num_nodes, union, seed=seed)
+        return np.repeat(positions[None], len(edges_by_generation), axis=0)
+
+    layouts, positions = [], None
+    for edges in edges_by_generation:
+        positions = layout(num_nodes, edges, positions, seed=seed)
+        layouts.append(positions)
+    return np.array(layouts).reshape(len(edges_by_generation), num_nodes, 2)
+
+def layout_path(output_file) -> str:
+    return f"data/{output_file}.layout.npz"
+
+def cached_layouts(output_file, num_nodes, edges_by_generation, engine="auto", warm_start=True, seed=42) -> np.ndarray:
+    """`compute_layouts`, persisted next to the results and reused while the edges and settings match."""
+    engine = resolve_engine(engine, num_nodes)
+    digest = hashlib.sha256(f"{engine}:{warm_start}:{seed}:{num_nodes}".encode("utf-8"))
+    for edges in edges_by_generation:
+        digest.update(np.ascontiguousarray(edges, dtype=np.int64).tobytes() + b"|")
+    fingerprint = digest.hexdigest()
+
+    path = layout_path(output_file)
+    if os.path.exists(path):
+        with np.load(path) as stored:
+            if str(stored["fingerprint"]) == fingerprint:
+                return stored["positions"]
+
+    positions = compute_layouts(num_nodes, edges_by_generation, engine, warm_start, seed)
+    np.savez_compressed(path, positions=positions, fingerprint=fingerprint)
+    return positions
\ No newline at end of file
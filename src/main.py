@@ -1,6 +1,6 @@
+import sys
 from network import initialise_simulation
-from simulation import run_simulation
-from analysis import analyse_results
+from simulation import output_filename, resume_simulation, run_simulation
 
 is_streamlit = False
 
@@ -13,26 +13,50 @@ SIMULATION_CONFIG = {
     "has_persona": True,
     "network_structure": "fully_connected",
     "regulating": False,
+    "regulation_retries": 3,  # Extra rounds when every candidate post is rejected (the last one is then posted, flagged "regulation_passed": false)
+    "regulation_candidates": 1,  # Candidate posts generated and regulated together per round
+    "reflection_refresh": None,  # Redo an unchanged reflection after this many reuses (None = only when its inputs change)
+    "decision_mode": "text",  # "structured": JSON-schema (OpenAI) or digit-constrained (local) decisions, about one token per post
     "connection_prob": 1,
     "k_neighbour": 10,
     "rewiring_prob": 0,
     "VLU_fraction": 0.8,
     "exploration_prob": 0.2,
     "provides_explanation": True,
-    "debug": False
+    "debug": False,
+    "seed": 42,
+    "max_workers": 8,
+    "rate_limits": None,  # e.g. {"gpt-4o": {"rpm": 500, "tpm": 30000, "max_concurrency": 16}}; None = no pacing, retries only
+    "max_retries": 6,
+    "shards": None,  # Split each phase into N tasks on worker processes (src/worker.py); None = in-process
+    "shard_workers": None,  # Local worker processes (None = one per shard, 0 = only workers started by hand)
+    "shard_queue": None,  # Work-queue directory; point it at a shared filesystem to add workers on other machines
+    "llm_cache": "off",  # "off", "read_write" or "replay"
+    "llm_cache_path": "data/llm_cache.sqlite",
+    "llm_cache_max_mb": 512,
+    "feed_size": None,  # Max posts per agent per generation (None = all visible posts)
+    "feed_policy": "random",  # "random", "upvotes" or "affinity" (ties broken at random)
+    "feed_batch_size": None,  # Max posts per interaction prompt
+    "output_format": "json",  # "json", "jsonl" (streamed rows) or "parquet" (needs pyarrow)
+    "keyframe_interval": 10,  # jsonl/parquet: full edge list every N generations, follow/unfollow deltas otherwise
+    "metrics": True,  # Per-generation homophily, assortativity, clustering, upvote Gini and flows in data/<output_file>.metrics.csv
+    "animation_format": "gif",  # "gif" or "mp4" (needs ffmpeg)
+    "frame_workers": 1,  # Processes rendering animation frames
+    "layout_engine": "auto",  # "kamada_kawai", "spring", "force" (NumPy, thousands of agents) or "auto"
+    "layout_warm_start": True,  # Each generation's layout continues from the previous one (False: one fixed layout)
+    "checkpoint": True  # Save data/<output_file>.ckpt after every generation; rerun with --resume after a crash
 }
 
-agents, initial_social_circle = initialise_simulation(**SIMULATION_CONFIG)
+output_file = output_filename(SIMULATION_CONFIG)
 
-output_file = (
-    f"simulation_{SIMULATION_CONFIG['num_agents']}agents_{SIMULATION_CONFIG['generations']}gens_"
-    f"{SIMULATION_CONFIG['llm_model'].replace('.', '_')}_"
-    f"{SIMULATION_CONFIG['network_structure']}_{SIMULATION_CONFIG['topic'].replace(' ', '_')}_"
-    f"VLU{SIMULATION_CONFIG['VLU_fraction']}_explore{SIMULATION_CONFIG['exploration_prob']}_"
-    f"temp{SIMULATION_CONFIG['temperature']}.json"
-)
+if "--resume" in sys.argv:
+    # Continue from the last completed generation in data/<output_file>.ckpt
+    resume_simulation(output_file, SIMULATION_CONFIG["generations"], is_streamlit)
+else:
+    agents, initial_social_circle = initialise_simulation(SIMULATION_CONFIG)
+    run_simulation(agents, SIMULATION_CONFIG["generations"], output_file, 
+                   initial_social_circle, is_streamlit, SIMULATION_CONFIG)
 
-run_simulation(agents, SIMULATION_CONFIG["generations"], output_file, 
-               initial_social_circle, is_streamlit)
+from analysis import analyse_results  # Loads the plotting stack only after the simulation has run
 
 analyse_results(output_file, SIMULATION_CONFIG, is_streamlit)
\ No newline at end of file
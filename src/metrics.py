@@ -0,0 +1,142 @@
+import csv
+import os
+import numpy as np
+
+# One row per generation, written to data/<output_file>.metrics.csv while the simulation runs
+METRICS = (
+    "generation",
+    "follow_edges",         # Directed follow relations
+    "mutual_edges",         # Pairs following each other
+    "homophily",            # Share of follow relations between agents of the same role
+    "vlu_assortativity",    # Newman's assortativity of the VLU/non-VLU role over follow relations
+    "mutual_clustering",    # Average clustering coefficient of the mutual-follow graph (sampled on large graphs)
+    "upvotes",              # Upvotes cast this generation
+    "upvote_gini",          # Gini coefficient of upvotes received per agent this generation
+    "vlu_to_vlu",           # Upvotes by VLU agents on VLU authors
+    "vlu_to_non_vlu",
+    "non_vlu_to_vlu",
+    "non_vlu_to_non_vlu",
+)
+COUNTS = {"generation", "follow_edges", "mutual_edges", "upvotes", "vlu_to_vlu", "vlu_to_non_vlu", "non_vlu_to_vlu", "non_vlu_to_non_vlu"}
+
+def gini(values) -> float:
+    """Gini coefficient of non-negative values (0 = equal, close to 1 = concentrated on one agent)."""
+    values = np.sort(np.asarray(values, dtype=float))
+    if not len(values) or values.sum() == 0:
+        return 0.0
+    ranks = np.arange(1, len(values) + 1)
+    return float((2 * ranks - len(values) - 1) @ values / (len(values) * values.sum()))
+
+def role_assortativity(is_vlu, src, dst) -> float:
+    """Newman's attribute assortativity r = (sum_i e_ii - sum_i a_i b_i) / (1 - sum_i a_i b_i) for two roles."""
+    if not len(src):
+        return 0.0
+    mixing = np.bincount(is_vlu[src] * 2 + is_vlu[dst], minlength=4).reshape(2, 2) / len(src)
+    expected = mixing.sum(axis=1) @ mixing.sum(axis=0)
+    return float((np.trace(mixing) - expected) / (1 - expected)) if expected < 1 else 0.0
+
+def average_clustering(num_nodes, mutual_edges, max_wedges=1_000_000, samples=100_000, seed=0) -> float:
+    """Mean local clustering of the undirected graph given as (k, 2) edges with u < v (isolated nodes count as 0).
+
+    Exact (every wedge checked against the sorted edge keys) up to `max_wedges` wedges. Larger
+    graphs get an estimate from `samples` seeded draws of a uniform node and a random wedge
+    centred on it (standard error at most 0.5 / sqrt(samples)), so time and memory stay bounded.
+    """
+    if num_nodes == 0 or not len(mutual_edges):
+        return 0.0
+
+    u, v = mutual_edges[:, 0], mutual_edges[:, 1]
+    src, dst = np.concatenate((u, v)), np.concatenate((v, u))
+    degree = np.bincount(src, minlength=num_nodes)
+    order = np.argsort(src * num_nodes + dst)
+    src, dst = src[order], dst[order]
+    keys = src * num_nodes + dst
+    indptr = np.concatenate(([0], np.cumsum(degree)))
+
+    def closed(a, b):
+        query = a * num_nodes + b
+        return keys[np.minimum(np.searchsorted(keys, query), len(keys) - 1)] == query
+
+    if (degree.astype(np.int64) ** 2).sum() > max_wedges:
+        rng = np.random.default_rng(seed)
+        centre = rng.integers(0, num_nodes, samples)
+        centre = centre[degree[centre] >= 2]  # Nodes without wedges count as 0
+        first = (rng.random(len(centre)) * degree[centre]).astype(np.int64)
+        second = (rng.random(len(centre)) * (degree[centre] - 1)).astype(np.int64)
+        second += second >= first  # Two distinct neighbours
+        start = indptr[centre]
+        return float(closed(dst[start + first], dst[start + second]).sum() / samples)
+
+    # Wedges centred on each node: every ordered pair of its neighbours (a, b), a != b
+    wedge_counts = degree[src]  # Each (node, a) entry pairs with every neighbour b of node
+    centre = np.repeat(src, wedge_counts)
+    a = np.repeat(dst, wedge_counts)
+    offset = np.arange(len(centre)) - np.repeat(np.cumsum(wedge_counts) - wedge_counts, wedge_counts)
+    b = dst[np.repeat(indptr[src], wedge_counts) + offset]
+    triangles = np.bincount(centre[(a != b) & closed(a, b)], minlength=num_nodes) / 2
+
+    possible = degree * (degree - 1) / 2
+    local = np.divide(triangles, possible, out=np.zeros(num_nodes), where=possible > 0)
+    return float(local.mean())
+
+def generation_metrics(generation, agents, follow_graph) -> dict:
+    """Computes every metric for the current state of the follow graph and this generation's upvotes."""
+    num_nodes = follow_graph.num_nodes
+    is_vlu = np.zeros(num_nodes, dtype=np.int64)
+    is_vlu[[node for node, agent in agents.items() if agent.role == "VLU"]] = 1
+
+    src, dst = follow_graph.edges()
+    mutual = follow_graph.mutual_edges()
+
+    voters = [node for node, agent in agents.items() for _ in getattr(agent, "current_upvotes", [])]
+    authors = [author for agent in agents.values() for _, author in getattr(agent, "current_upvotes", [])]
+    voters, authors = np.asarray(voters, dtype=np.int64), np.asarray(authors, dtype=np.int64)
+    flow = np.bincount(is_vlu[voters] * 2 + is_vlu[authors], minlength=4) if len(voters) else np.zeros(4, dtype=np.int64)
+
+    return {
+        "generation": generation,
+        "follow_edges": len(src),
+        "mutual_edges": len(mutual),
+        "homophily": round(float((is_vlu[src] == is_vlu[dst]).mean()), 6) if len(src) else 0.0,
+        "vlu_assortativity": round(role_assortativity(is_vlu, src, dst), 6),
+        "mutual_clustering": round(average_clustering(num_nodes, mutual), 6),
+        "upvotes": len(voters),
+        "upvote_gini": round(gini(np.bincount(authors, minlength=num_nodes)[list(agents)]), 6),
+        "vlu_to_vlu": int(flow[3]),
+        "vlu_to_non_vlu": int(flow[2]),
+        "non_vlu_to_vlu": int(flow[1]),
+        "non_vlu_to_non_vlu": int(flow[0]),
+    }
+
+def metrics_path(output_file) -> str:
+    return f"data/{output_file}.metrics.csv"
+
+class MetricsWriter:
+    """Appends one CSV row of `generation_metrics` per generation to `data/<output_file>.metrics.csv`."""
+
+    def __init__(self, output_file, resume_from=None):
+        self.path = metrics_path(output_file)
+        rows = []
+        if resume_from is not None and os.path.exists(self.path):  # Keep the checkpointed generations only
+            with open(self.path, "r", newline="", encoding="utf-8") as file:
+                rows = [row for row in csv.DictReader(file) if int(row["generation"]) <= resume_from]
+
+        self.file = open(self.path, "w", newline="", encoding="utf-8")
+        self.writer = csv.DictWriter(self.file, fieldnames=METRICS)
+        self.writer.writeheader()
+        self.writer.writerows(rows)
+        self.file.flush()
+
+    def write_generation(self, generation, agents, follow_graph) -> dict:
+        row = generation_metrics(generation, agents, follow_graph)
+        self.writer.writerow(row)
+        self.file.flush()
+        return row
+
+    def close(self) -> None:
+        self.file.close()
+
+def read_metrics(path) -> list[dict]:
+    """A metrics table (see `metrics_path`) as a list of {metric: value} rows."""
+    with open(path, "r", newline="", encoding="utf-8") as file:
+        return [{key: int(value) if key in COUNTS else float(value) for key, value in row.items()} for row in csv.DictReader(file)]
\ No newline at end of file
@@ -1,22 +1,48 @@
 import networkx as nx
+import numpy as np
 import random
 from agent import Agent
+from graph import FollowGraph
+
+def make_agent(SIMULATION_CONFIG, node, role, persona, follow_graph) -> Agent:
+    """Builds one agent from the run config (shared by `initialise_simulation` and shard workers)."""
+    return Agent(node, SIMULATION_CONFIG["llm_model"], SIMULATION_CONFIG["temperature"], SIMULATION_CONFIG["topic"], role, persona,
+                 SIMULATION_CONFIG["regulating"], follow_graph, SIMULATION_CONFIG["exploration_prob"],
+                 SIMULATION_CONFIG["provides_explanation"], SIMULATION_CONFIG["debug"],
+                 SIMULATION_CONFIG.get("regulation_retries", 3), SIMULATION_CONFIG.get("regulation_candidates", 1),
+                 SIMULATION_CONFIG.get("reflection_refresh"), SIMULATION_CONFIG.get("decision_mode", "text"))
 
 def initialise_simulation(SIMULATION_CONFIG) -> tuple[dict[int, Agent], dict[int, list[int]]]:
-    """Creates a social network graph and initialises agents."""
+    """Creates a social network graph and initialises agents.
+
+    A missing or None "seed" is drawn here and written back into the config, so the graph, the VLU
+    set and `run_simulation`'s exposure streams all use (and checkpoint) the same seed.
+    """
 
-    num_agents, _, llm_model, temperature, topic, has_persona, network_structure, regulating, connection_prob, k_neighbour, rewiring_prob, VLU_fraction, exploration_prob, provides_explanation, debug = SIMULATION_CONFIG.values()
+    num_agents = SIMULATION_CONFIG["num_agents"]
+    has_persona = SIMULATION_CONFIG["has_persona"]
+    network_structure = SIMULATION_CONFIG["network_structure"]
+    connection_prob = SIMULATION_CONFIG["connection_prob"]
+    k_neighbour = SIMULATION_CONFIG["k_neighbour"]
+    rewiring_prob = SIMULATION_CONFIG["rewiring_prob"]
+    VLU_fraction = SIMULATION_CONFIG["VLU_fraction"]
+    if SIMULATION_CONFIG.get("seed") is None:
+        SIMULATION_CONFIG["seed"] = int(np.random.SeedSequence().entropy)
+    seed = SIMULATION_CONFIG["seed"]
+    decision_mode = SIMULATION_CONFIG.get("decision_mode", "text")
+    if decision_mode not in ("text", "structured"):
+        raise ValueError(f"Decision mode '{decision_mode}' not recognised. Choose from ['text', 'structured'].")
 
     graph_generators = {
-        "random": lambda: nx.erdos_renyi_graph(num_agents, connection_prob, seed=42),
-        "small_world": lambda: nx.watts_strogatz_graph(num_agents, k_neighbour, rewiring_prob, seed=42),
-        "scale_free": lambda: nx.barabasi_albert_graph(num_agents, k_neighbour, seed=42),
+        "random": lambda: nx.erdos_renyi_graph(num_agents, connection_prob, seed=seed),
+        "small_world": lambda: nx.watts_strogatz_graph(num_agents, k_neighbour, rewiring_prob, seed=seed),
+        "scale_free": lambda: nx.barabasi_albert_graph(num_agents, k_neighbour, seed=seed),
         "fully_connected": lambda: nx.complete_graph(num_agents),
     }
     G = graph_generators.get(network_structure, lambda: nx.complete_graph(num_agents))()
 
     # Assign VLU agents randomly
-    VLU_agents = set(random.sample(list(G.nodes), int(VLU_fraction * num_agents)))
+    VLU_agents = set(random.Random(seed).sample(list(G.nodes), int(VLU_fraction * num_agents)))
 
     # Load personas from file
     personas = []
@@ -24,11 +50,13 @@ def initialise_simulation(SIMULATION_CONFIG) -> tuple[dict[int, Agent], dict[int
         with open("data/personas.txt", "r") as file:
             personas = [persona.strip() for persona in file.readline().split(",")]
 
+    # Follow relations live in one shared array-backed graph (undirected edges become mutual follows)
+    follow_graph = FollowGraph.from_adjacency(num_agents, {node: G.neighbors(node) for node in G.nodes})
+
     # Initialise agents (100 personas in total, cycled through if more necessary)
     agents = {
-        node: Agent(node, llm_model, temperature, topic, "VLU" if node in VLU_agents else "non-VLU",
-                    personas[node % len(personas)] if has_persona else None, regulating, set(G.neighbors(node)), exploration_prob, 
-                    provides_explanation, debug)
+        node: make_agent(SIMULATION_CONFIG, node, "VLU" if node in VLU_agents else "non-VLU",
+                         personas[node % len(personas)] if has_persona else None, follow_graph)
         for node in G.nodes
     }
 
@@ -1,11 +1,14 @@
-from utils import generate_llm_response
+import sys
+from utils import generate_llm_responses
 
 class PostGenerator:
+    __slots__ = ("agent",)
+
     def __init__(self, agent):
         self.agent = agent
 
     def create_post(self) -> str:
-        self.agent.reflector.reflect()
+        self.agent.reflector.reflect()  # Once per post, however many candidates are regulated
 
         context_extension = ""
         if self.agent.role == "VLU":
@@ -19,19 +22,40 @@ class PostGenerator:
         context = f"I am about to post on social media {f'about {self.agent.topic}' if self.agent.topic else ''}.\n"
         context += f"My persona: {self.agent.persona}\n" if self.agent.persona else ""
         context += f"My style summary: {self.agent.reflection}\n"
-        context += f"My most successful posts: {self.agent.previous_posts[-3:]}\n"
+        context += f"My most successful posts: {list(self.agent.previous_posts)}\n"
         context += context_extension
         context += "Return only the post in 280 characters or less."
 
-        new_post = generate_llm_response(context, self.agent.llm_model, self.agent.temperature)
-
-        # Regulate the post (if regulating) and generate a new one if it doesn't pass
-        if self.agent.regulating and not self.agent.regulator.regulate(new_post):
-            return self.create_post()
+        new_post = sys.intern(self.generate_regulated(context))  # One copy shared by memories, feeds and outputs
 
         self.agent.previous_posts.append((new_post, 0))
 
         if self.agent.debug:
             print(new_post)
 
-        return new_post
\ No newline at end of file
+        return new_post
+
+    def generate_regulated(self, context) -> str:
+        """Samples candidate posts until one passes regulation, for at most `regulation_retries` extra rounds.
+
+        Each round asks for `regulation_candidates` posts and regulates them together. If no candidate
+        is approved, the last one is posted anyway and `agent.regulation_passed` (recorded with the
+        post in the output) is set to False.
+        """
+        n = self.agent.regulation_candidates if self.agent.regulating else 1
+        self.agent.regulation_passed = None
+        for _ in range(self.agent.regulation_retries + 1 if self.agent.regulating else 1):
+            candidates = generate_llm_responses(context, self.agent.llm_model, self.agent.temperature, n)
+            if not self.agent.regulating:
+                return candidates[0]
+
+            for candidate, approved in zip(candidates, self.agent.regulator.regulate_posts(candidates)):
+                if approved:
+                    self.agent.regulation_passed = True
+                    return candidate
+
+        self.agent.regulation_passed = False
+
+        if self.agent.debug:
+            print(f"Agent {self.agent.node_id}: no candidate passed regulation, posting the last one")
+        return candidates[-1]
@@ -1,28 +1,113 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
+from feed import build_feed, feed_statistics, sample_exposures
+from utils import agent_stream
 # from utils import deadly_cocktail_strength
 
-def generate_posts(agents, global_posts, post_upvotes, post_cocktail_scores, progress_bar=None) -> None:
-    """Generates posts for each agent and calculates their impact."""
-    for node, agent in agents.items():
+def generate_posts(agents, global_posts, post_upvotes, post_cocktail_scores, progress_bar=None, max_workers=1) -> None:
+    """Generates posts for each agent and calculates their impact.
+
+    With `max_workers > 1` the LLM calls are dispatched on a thread pool; posts are
+    still recorded in agent order so the output matches a sequential run.
+    """
+    for agent in agents.values():
         agent.current_upvotes = []
-        post = agent.create_post()
+
+    def create_post(node):
+        with agent_stream(node):  # The agent's own LLM sampling stream
+            return agents[node].create_post()
+
+    if max_workers > 1:
+        posts = run_concurrently(create_post, agents, max_workers, progress_bar)
+    else:
+        posts = {}
+        for node in agents:
+            posts[node] = create_post(node)
+            if progress_bar:
+                progress_bar.update(1)
+
+    record_posts(agents, posts, global_posts, post_upvotes, post_cocktail_scores)
+
+def run_concurrently(function, nodes, max_workers, progress_bar=None) -> dict:
+    """{node: function(node)} on a thread pool. The first failure cancels every call that has not started yet."""
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = {node: executor.submit(function, node) for node in nodes}
+        for future in as_completed(futures.values()):
+            future.result()  # Raise on the first failure instead of sending the rest of the generation's requests
+            if progress_bar:
+                progress_bar.update(1)
+    except BaseException:
+        executor.shutdown(wait=True, cancel_futures=True)
+        raise
+    executor.shutdown(wait=True)
+    return {node: future.result() for node, future in futures.items()}
+
+def record_posts(agents, posts, global_posts, post_upvotes, post_cocktail_scores) -> None:
+    """Adds {node: post} to the generation's posts, in agent order."""
+    for node in agents:
+        post = posts[node]
         global_posts[node] = post
         post_upvotes[post] = 0
         # post_cocktail_scores[post] = deadly_cocktail_strength(post)
-        
+
+def interact_with_posts(agents, global_posts, post_upvotes, generation_data, progress_bar=None, feed_size=None, feed_policy="random", batch_size=None, rng=None,
+                        max_workers=1) -> None:
+    """Handles interactions where agents upvote or unfollow others.
+
+    Each agent sees a feed built by `feed.build_feed`: capped at `feed_size` posts ranked by
+    `feed_policy`, and sent to the LLM in prompts of at most `batch_size` posts. Exposure to
+    non-followed posts is drawn for all agents at once from `rng` (a NumPy Generator).
+
+    Every feed is built from the same snapshot (this generation's posts and the follow graph as it
+    stood before the phase), and agents only return their decisions. With `max_workers > 1` they
+    decide on a thread pool; upvotes and (un)follows are then applied in agent order, so the
+    result is identical to a sequential run.
+    """
+    feeds = build_feeds(agents, global_posts, feed_size, feed_policy, rng)
+    decisions = decide_interactions(agents, feeds, batch_size, progress_bar, max_workers)
+    apply_interactions(agents, decisions, post_upvotes, generation_data)
+
+def decide_interactions(agents, feeds, batch_size=None, progress_bar=None, max_workers=1) -> dict:
+    """{node: agent.interact(...)} for every agent's feed, on a thread pool when `max_workers > 1`."""
+    def decide(node):
+        with agent_stream(node):  # The agent's own LLM sampling stream
+            return agents[node].interact(*feeds[node], batch_size)
+
+    if max_workers > 1:
+        return run_concurrently(decide, agents, max_workers, progress_bar)
+
+    decisions = {}
+    for node in agents:
+        decisions[node] = decide(node)
         if progress_bar:
             progress_bar.update(1)
+    return decisions
 
-def interact_with_posts(agents, global_posts, post_upvotes, generation_data, progress_bar=None) -> None:
-    """Handles interactions where agents upvote or unfollow others."""
+def build_feeds(agents, global_posts, feed_size=None, feed_policy="random", rng=None) -> dict:
+    """Every agent's (followed_posts, explored_posts) for this generation, from one snapshot of posts and follows."""
+    rng = rng or np.random.default_rng()
     post_list = list(global_posts.items())
+    stats = feed_statistics(agents, post_list)
+    follow_graph = next(iter(agents.values())).follow_graph
+    explored, offsets = sample_exposures(agents, follow_graph, post_list, stats, rng, feed_size)
 
+    feeds = {}
+    for idx, (node, agent) in enumerate(agents.items()):
+        explored_positions = explored[offsets[idx]:offsets[idx + 1]].tolist()
+        feeds[node] = build_feed(agent, post_list, stats, explored_positions, feed_size, feed_policy, rng)
+    return feeds
+
+def apply_interactions(agents, decisions, post_upvotes, generation_data) -> None:
+    """Deterministic reduce: applies each agent's `interact` result in agent order."""
     for node, agent in agents.items():
-        upvoted, removed_agents, explanations = agent.interact(post_list)
+        upvoted, removed_agents, followed_agents, explanations = decisions[node]
 
         for post, author_id in upvoted:
             post_upvotes[post] += 1
             agent.current_upvotes.append((post, author_id))
 
+        agent.social_circle.update(followed_agents)
         agent.social_circle.difference_update(removed_agents)
 
         generation_data[node] = {
@@ -37,15 +122,19 @@ def interact_with_posts(agents, global_posts, post_upvotes, generation_data, pro
             "explanations": explanations if agent.provides_explanation else {}
         }
 
-        # ✅ Only update progress bar if it's not None
-        if progress_bar:
-            progress_bar.update(1)
+def store_generation_data(agents, global_posts, post_upvotes, post_cocktail_scores, generation_data, include_social_circle=True) -> None:
+    """Updates agent memory and stores final statistics for each generation.
+
+    `include_social_circle=False` skips the per-agent follow lists for writers that encode the graph themselves.
+    """
+    follow_graph = next(iter(agents.values())).follow_graph
+    follow_graph.compact()  # Applies this generation's (un)follows
+    social_circles = follow_graph.to_lists() if include_social_circle else None
 
-def store_generation_data(agents, global_posts, post_upvotes, post_cocktail_scores, generation_data) -> None:
-    """Updates agent memory and stores final statistics for each generation."""
     for sender, post in global_posts.items():
         upvotes = post_upvotes[post]
-        agents[sender].previous_posts[-1] = (post, upvotes)
+        agents[sender].settle_post(post, upvotes)
+        agents[sender].remember_upvotes(agents[sender].current_upvotes)
 
         generation_data[sender].update({
             "post": post,
@@ -53,5 +142,8 @@ def store_generation_data(agents, global_posts, post_upvotes, post_cocktail_scor
             # "deadly_cocktail_score": post_cocktail_scores[post],
             "upvoted_posts": agents[sender].current_upvotes,
             "reflection": agents[sender].reflection,
-            "social_circle": list(agents[sender].social_circle)
-        })
\ No newline at end of file
+        })
+        if agents[sender].regulation_passed is not None:  # Regulated runs: False marks a post published after every candidate was rejected
+            generation_data[sender]["regulation_passed"] = agents[sender].regulation_passed
+        if include_social_circle:
+            generation_data[sender]["social_circle"] = social_circles[sender]
\ No newline at end of file
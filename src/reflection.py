@@ -1,24 +1,37 @@
+import hashlib
 from utils import generate_llm_response
 
 class Reflector:
+    __slots__ = ("agent", "fingerprint", "reused")
+
     def __init__(self, agent):
         self.agent = agent
+        self.fingerprint = None  # Hash of the prompt behind the current reflection
+        self.reused = 0  # Consecutive reflections answered from the memo
 
     def reflect(self) -> None:
         if not self.agent.previous_posts:
             return
         
-        sorted_posts = sorted(self.agent.previous_posts, key=lambda x: x[1], reverse=True)
-        top_posts = [f"{msg} (Upvotes: {upvotes})" for msg, upvotes in sorted_posts[:3]]
+        top_posts = [f"{msg} (Upvotes: {upvotes})" for msg, upvotes in self.agent.top_posts]
         high_engagement_topics = "\n".join(top_posts) if top_posts else "No clear patterns yet."
 
         context = f"My most upvoted posts:\n{high_engagement_topics}\n"
-        context += f"Recent posts I upvoted:\n{self.agent.upvoted_posts[-5:]}\n"
+        context += f"Recent posts I upvoted:\n{list(self.agent.upvoted_posts)}\n"
         context += "Summarise my posting style, common topics, and engagement in 2 sentences."
         if self.agent.role == "VLU":
             context += " Include that I am a violent language user."
 
+        # The prompt only depends on the top-3 posts, the last 5 upvotes and the role: reuse the
+        # reflection while they are unchanged, unless it is older than `reflection_refresh` reuses
+        fingerprint = hashlib.sha256(context.encode("utf-8")).digest()
+        refresh = self.agent.reflection_refresh
+        if fingerprint == self.fingerprint and not (refresh and self.reused >= refresh):
+            self.reused += 1
+            return
+
         self.agent.reflection = generate_llm_response(context, self.agent.llm_model, self.agent.temperature)
+        self.fingerprint, self.reused = fingerprint, 0
 
         if self.agent.debug:
             print("Reflection:", self.agent.reflection)
@@ -0,0 +1,48 @@
+import gc
+import os
+import threading
+from collections import OrderedDict, namedtuple
+
+# A loaded Hugging Face model; `lock` serialises inference on the shared pipeline
+LocalModel = namedtuple("LocalModel", ["tokenizer", "model", "pipeline", "lock"])
+
+class BackendRegistry:
+    """Process-wide store of LLM clients and local models, built once and reused across calls."""
+
+    def __init__(self, max_local_models=1):
+        self.max_local_models = max_local_models
+        self._clients = {}
+        self._local_models = OrderedDict()  # model name -> LocalModel, least recently used first
+        self._lock = threading.Lock()
+
+    def get_client(self, key, factory):
+        """Returns the API client stored under `key`, creating it with `factory()` on first use."""
+        with self._lock:
+            if key not in self._clients:
+                self._clients[key] = factory()
+            return self._clients[key]
+
+    def get_local_model(self, model_name, loader) -> LocalModel:
+        """Returns a loaded local model, evicting the least recently used one when the registry is full."""
+        with self._lock:
+            if model_name in self._local_models:
+                self._local_models.move_to_end(model_name)
+                return self._local_models[model_name]
+
+            while self._local_models and len(self._local_models) >= self.max_local_models:
+                self._local_models.popitem(last=False)
+                gc.collect()  # Release the evicted weights before loading the next model
+
+            tokenizer, model, pipe = loader()
+            local_model = LocalModel(tokenizer, model, pipe, threading.Lock())
+            self._local_models[model_name] = local_model
+            return local_model
+
+    def clear(self) -> None:
+        """Drops every cached client and model."""
+        with self._lock:
+            self._clients.clear()
+            self._local_models.clear()
+        gc.collect()
+
+registry = BackendRegistry(max_local_models=int(os.getenv("FUSENET_MAX_LOCAL_MODELS", "1")))
@@ -1,6 +1,9 @@
+import re
 from utils import generate_llm_response
 
 class Regulator:
+    __slots__ = ("agent",)
+
     def __init__(self, agent):
         self.agent = agent
 
@@ -13,4 +16,21 @@ class Regulator:
 
         feedback = generate_llm_response(context, self.agent.llm_model, self.agent.temperature)
 
-        return "yes" in feedback.lower()
\ No newline at end of file
+        return "yes" in feedback.lower()
+
+    def regulate_posts(self, posts) -> list[bool]:
+        """Checks several candidate posts in one call; unanswered candidates count as rejected."""
+        if not self.agent.previous_posts:
+            return [True] * len(posts)
+        if len(posts) == 1:
+            return [self.regulate(posts[0])]
+
+        context = f"Given I am a social media user with this context: {self.agent.reflection}\n"
+        context += "I am about to post one of these:\n"
+        context += "\n".join(f"{idx}: {' '.join(post.split())}" for idx, post in enumerate(posts, 1)) + "\n"
+        context += "Does each post align given the context? For each number, return '<number>: yes' or '<number>: no' on its own line."
+
+        feedback = generate_llm_response(context, self.agent.llm_model, self.agent.temperature)
+
+        answers = {int(idx): answer for idx, answer in re.findall(r"(\d+)\s*:\s*(yes|no)", feedback.lower())}
+        return [answers.get(idx) == "yes" for idx in range(1, len(posts) + 1)]
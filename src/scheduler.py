@@ -0,0 +1,169 @@
+import contextlib
+import random
+import threading
+import time
+
+RETRYABLE_ERRORS = ("RateLimitError", "APITimeoutError", "APIConnectionError", "InternalServerError", "ServiceUnavailableError")
+
+class RateLimitError(Exception):
+    """A backend refused a request for exceeding its quota (HTTP 429); raised by the stub to simulate one."""
+
+    def __init__(self, message="Rate limit exceeded", retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+def is_rate_limit(error) -> bool:
+    return isinstance(error, RateLimitError) or type(error).__name__ == "RateLimitError" or getattr(error, "status_code", None) == 429
+
+def is_retryable(error) -> bool:
+    """Rate limits, timeouts, dropped connections and 5xx responses (matched by name, so no provider SDK is imported)."""
+    status = getattr(error, "status_code", None)
+    return is_rate_limit(error) or type(error).__name__ in RETRYABLE_ERRORS or (isinstance(status, int) and status >= 500)
+
+def retry_after(error):
+    """Seconds the provider asked us to wait, if it said (`retry_after` or a Retry-After header)."""
+    seconds = getattr(error, "retry_after", None)
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if seconds is None and headers is not None:
+        seconds = headers.get("retry-after")
+    try:
+        return float(seconds) if seconds is not None else None
+    except (TypeError, ValueError):
+        return None
+
+class TokenBucket:
+    """Holds up to `per_minute` units, refilled continuously at `per_minute` per minute."""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount=1.0) -> None:
+        """Blocks until `amount` units (at most a full bucket) are available, then takes them."""
+        amount = min(amount, self.capacity)
+        while True:
+            with self.lock:
+                self._refill()
+                if self.level >= amount:
+                    self.level -= amount
+                    return
+                wait = (amount - self.level) / self.rate
+            time.sleep(wait)
+
+    def adjust(self, amount) -> None:
+        """Takes (or refunds, if negative) units once the real cost of a request is known; the level may go below zero."""
+        with self.lock:
+            self._refill()
+            self.level = min(self.capacity, self.level - amount)
+
+class AdaptiveLimiter:
+    """Concurrency limit under AIMD: +1 per window of successes, halved on every rate-limit response."""
+
+    def __init__(self, max_limit, min_limit=1):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self.condition = threading.Condition()
+
+    def __enter__(self):
+        with self.condition:
+            while self.in_flight >= int(self.limit):
+                self.condition.wait()
+            self.in_flight += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    def succeeded(self) -> None:
+        with self.condition:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)  # Additive increase: ~+1 per `limit` successes
+            self.condition.notify_all()
+
+    def rate_limited(self) -> None:
+        with self.condition:
+            self.limit = max(self.min_limit, self.limit / 2)  # Multiplicative decrease
+
+class RequestScheduler:
+    """Paces one model's requests: RPM/TPM token buckets, adaptive concurrency and jittered exponential backoff.
+
+    A request reserves its estimated prompt tokens plus `completion_tokens` per sample before it is
+    sent, and the difference is settled once the response is in. Retryable failures wait
+    `base_delay * 2^attempt` seconds (capped at `max_delay`, full jitter) or the provider's
+    Retry-After; rate limits also halve the concurrency limit.
+    """
+
+    def __init__(self, rpm=None, tpm=None, max_concurrency=64, max_retries=6, base_delay=1.0, max_delay=60.0, completion_tokens=100):
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.limiter = AdaptiveLimiter(max_concurrency)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.completion_tokens = completion_tokens
+        self.rng = random.Random()  # Jitter only; never touches the simulation's RNG streams
+
+    def backoff(self, attempt, error) -> float:
+        return retry_after(error) or self.rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def call(self, request, prompt_tokens, n=1, count_tokens=len, gate=None, on_retry=None):
+        """Runs `request()` (returning a list of completion strings) within the limits, retrying transient failures.
+
+        `count_tokens(text)` sizes the completions, `gate` is held only while the request is in flight
+        (not while backing off) and `on_retry(error)` is told about every retried failure.
+        """
+        reserved = prompt_tokens + self.completion_tokens * n
+        for attempt in range(self.max_retries + 1):
+            if self.requests:
+                self.requests.acquire()
+            if self.tokens:
+                self.tokens.acquire(reserved)
+
+            try:
+                with self.limiter, gate or contextlib.nullcontext():
+                    responses = request()
+            except Exception as error:
+                if self.tokens:
+                    self.tokens.adjust(-reserved)  # A refused request does not count against the token quota
+                if attempt == self.max_retries or not is_retryable(error):
+                    raise
+                if is_rate_limit(error):
+                    self.limiter.rate_limited()
+                if on_retry:
+                    on_retry(error)
+                time.sleep(self.backoff(attempt, error))
+                continue
+
+            self.limiter.succeeded()
+            if self.tokens:
+                self.tokens.adjust(prompt_tokens + sum(count_tokens(response) for response in responses) - reserved)
+            return responses
+
+schedulers = {}
+_schedulers_lock = threading.Lock()
+_settings = {"limits": {}, "max_retries": 6}
+
+def configure_scheduler(rate_limits=None, max_retries=6) -> None:
+    """Sets per-model limits, e.g. {"gpt-4o": {"rpm": 500, "tpm": 30000, "max_concurrency": 16}}; "*" applies to any other model."""
+    with _schedulers_lock:
+        _settings.update(limits=dict(rate_limits or {}), max_retries=max_retries)
+        schedulers.clear()
+
+def scheduler_for(llm_model) -> RequestScheduler:
+    """The process-wide scheduler of `llm_model`, created on first use from the configured limits."""
+    with _schedulers_lock:
+        if llm_model not in schedulers:
+            limits = _settings["limits"].get(llm_model, _settings["limits"].get("*", {}))
+            schedulers[llm_model] = RequestScheduler(max_retries=_settings["max_retries"], **limits)
+        return schedulers[llm_model]
\ No newline at end of file
@@ -0,0 +1,243 @@
+import os
+import pickle
+import shutil
+import subprocess
+import sys
+import time
+import numpy as np
+import stub
+import utils
+from checkpoint import agent_state, restore_agent_state
+from processing import apply_interactions, build_feeds, record_posts
+
+class FileQueue:
+    """Work queue on a (possibly shared) filesystem, with no broker.
+
+    Tasks are pickles in `tasks/`. A worker claims one by renaming it into `claimed/` (atomic: one
+    winner) and publishes its result in `done/`. Claims are refreshed by a heartbeat; a claim
+    older than the lease is put back in `tasks/` for another worker, so a dead worker only costs
+    a retry. A `stop` file tells the workers to exit.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.dirs = {name: os.path.join(root, name) for name in ("tasks", "claimed", "done")}
+        for path in self.dirs.values():
+            os.makedirs(path, exist_ok=True)
+
+    def _path(self, state, task_id) -> str:
+        return os.path.join(self.dirs[state], f"{task_id}.pkl")
+
+    @staticmethod
+    def _write(path, obj) -> None:
+        with open(f"{path}.{os.getpid()}.tmp", "wb") as file:  # Ignored by `claim` until renamed
+            pickle.dump(obj, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(f"{path}.{os.getpid()}.tmp", path)
+
+    def reset(self) -> None:
+        """Drops the tasks, claims, results and stop file of an earlier run (workers already polling stay attached)."""
+        for path in self.dirs.values():
+            shutil.rmtree(path, ignore_errors=True)
+            os.makedirs(path, exist_ok=True)
+        if self.stopped():
+            os.remove(os.path.join(self.root, "stop"))
+
+    def put(self, task_id, task) -> None:
+        self._write(self._path("tasks", task_id), task)
+
+    def claim(self):
+        """(task_id, task) of the first task this worker wins, or None if there is none."""
+        try:
+            names = sorted(os.listdir(self.dirs["tasks"]))
+        except FileNotFoundError:  # Queue removed by the coordinator
+            return None
+        for name in names:
+            if not name.endswith(".pkl"):
+                continue
+            task_id = name[:-len(".pkl")]
+            try:
+                # Refresh the mtime first: a task that waited longer than the lease must not look stale once claimed
+                os.utime(self._path("tasks", task_id))
+                os.rename(self._path("tasks", task_id), self._path("claimed", task_id))
+                with open(self._path("claimed", task_id), "rb") as file:
+                    return task_id, pickle.load(file)
+            except FileNotFoundError:  # Another worker got it first, or it was requeued meanwhile
+                continue
+        return None
+
+    def heartbeat(self, task_id) -> None:
+        try:
+            os.utime(self._path("claimed", task_id))
+        except FileNotFoundError:
+            pass
+
+    def complete(self, task_id, result) -> None:
+        self._write(self._path("done", task_id), result)
+        try:
+            os.remove(self._path("claimed", task_id))
+        except FileNotFoundError:
+            pass
+
+    def result(self, task_id):
+        path = self._path("done", task_id)
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as file:
+            return pickle.load(file)
+
+    def requeue_stale(self, lease) -> None:
+        """Puts back claims whose worker has not sent a heartbeat for `lease` seconds."""
+        now = time.time()
+        for name in os.listdir(self.dirs["claimed"]):
+            path = os.path.join(self.dirs["claimed"], name)
+            try:
+                if name.endswith(".pkl") and now - os.path.getmtime(path) > lease:
+                    os.rename(path, os.path.join(self.dirs["tasks"], name))
+            except FileNotFoundError:  # Completed meanwhile
+                continue
+
+    def stop(self) -> None:
+        open(os.path.join(self.root, "stop"), "w").close()
+
+    def stopped(self) -> bool:
+        return os.path.exists(os.path.join(self.root, "stop"))
+
+def _stream(key):
+    """Agent of an LLM occurrence counter ("<generation>:<node>:<digest>"), or None for calls made outside any agent."""
+    parts = key.split(":")
+    return int(parts[1]) if len(parts) == 3 else None
+
+class ShardPool:
+    """Runs each phase of a generation as `num_shards` tasks on worker processes (scatter, barrier, gather).
+
+    `local_workers` processes (`src/worker.py`) are started on this machine; workers on other
+    machines join by running `python src/worker.py --queue <queue_dir>` against the same shared
+    directory. Tasks carry the config, each agent's role, persona and mutable state, and the LLM
+    counters of its stream, so workers hold no state between tasks and results match an
+    in-process run. Rate limits apply per worker process. Workers only read the LLM cache and
+    return new responses with their results, so the coordinator is its only writer.
+    """
+
+    def __init__(self, queue_dir, num_shards, local_workers=None, lease=600, poll=0.05):
+        self.queue_dir = queue_dir
+        self.num_shards = num_shards
+        self.local_workers = num_shards if local_workers is None else local_workers
+        self.lease = lease
+        self.poll = poll
+        self.round = 0
+        self.processes = []
+        self.queue = None
+        self.created_parent = False
+
+    def start(self) -> "ShardPool":
+        self.created_parent = not os.path.exists(os.path.dirname(os.path.abspath(self.queue_dir)))
+        self.queue = FileQueue(self.queue_dir)
+        self.queue.reset()  # Leftovers of an interrupted run
+        worker_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "worker.py")
+        self.processes = [
+            subprocess.Popen([sys.executable, worker_path, "--queue", self.queue_dir, "--lease", str(self.lease)],
+                             stdout=subprocess.DEVNULL)
+            for _ in range(self.local_workers)
+        ]
+        return self
+
+    def close(self) -> None:
+        if self.queue is not None:
+            self.queue.stop()
+        for process in self.processes:
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        shutil.rmtree(self.queue_dir, ignore_errors=True)
+        if self.created_parent:  # e.g. data/queue/, unless another run still uses it
+            try:
+                os.rmdir(os.path.dirname(os.path.abspath(self.queue_dir)))
+            except OSError:
+                pass
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def run(self, phase, config, agents, feeds=None, progress_bar=None, batch_size=None) -> dict:
+        """Scatters `phase` over the shards, waits for all of them and returns {node: result}."""
+        self.round += 1
+        shards = [chunk.tolist() for chunk in np.array_split(np.fromiter(agents, dtype=np.int64), self.num_shards) if len(chunk)]
+
+        # Each agent's LLM counters for this generation travel with it, so workers continue exactly where the last phase stopped
+        counters = {node: {"stub": {}, "cache": {}} for node in agents}
+        for kind, occurrences in (("stub", stub.stub_llm.occurrences),
+                                  ("cache", utils.response_cache.occurrences if utils.response_cache is not None else {})):
+            for key, count in occurrences.items():
+                node = _stream(key)
+                if node in counters:
+                    counters[node][kind][key] = count
+
+        pending = {}
+        for idx, nodes in enumerate(shards):
+            task_id = f"{self.round:06d}-{phase}-{idx:04d}"
+            self.queue.put(task_id, {
+                "phase": phase,
+                "generation": utils.llm_generation,
+                "config": config,
+                "agents": {node: {"role": agents[node].role, "persona": agents[node].persona, "state": agent_state(agents[node])}
+                           for node in nodes},
+                "feeds": {node: feeds[node] for node in nodes} if feeds is not None else None,
+                "batch_size": batch_size,
+                "counters": {kind: {key: count for node in nodes for key, count in counters[node][kind].items()}
+                             for kind in ("stub", "cache")},
+            })
+            pending[task_id] = nodes
+
+        # Barrier: the next phase needs every shard's results
+        results = {}
+        while pending:
+            for task_id in list(pending):
+                result = self.queue.result(task_id)
+                if result is None:
+                    continue
+                if result["error"]:
+                    raise RuntimeError(f"Shard task {task_id} failed:\n{result['error']}")
+                self.merge(result)
+                results.update(result["results"])
+                nodes = pending.pop(task_id)
+                if progress_bar:
+                    progress_bar.update(len(nodes))
+            if pending:
+                if self.processes and all(process.poll() is not None for process in self.processes):
+                    raise RuntimeError(f"All local shard workers exited (codes {[p.returncode for p in self.processes]}).")
+                self.queue.requeue_stale(self.lease)
+                time.sleep(self.poll)
+        return results
+
+    def merge(self, result) -> None:
+        stub.stub_llm.occurrences.update(result["counters"]["stub"])
+        if utils.response_cache is not None:
+            utils.response_cache.occurrences.update(result["counters"]["cache"])
+        with utils._usage_lock:
+            for key, value in result["usage"].items():
+                utils.llm_usage[key] = utils.llm_usage.get(key, 0) + value
+        if utils.response_cache is not None:  # Workers never write the cache, so size-based eviction sees every entry
+            for key, response in result["cache_entries"]:
+                utils.response_cache.put(key, response)
+
+def sharded_generate_posts(pool, config, agents, global_posts, post_upvotes, post_cocktail_scores, progress_bar=None) -> None:
+    """`processing.generate_posts` with the agents' reflections, regulation and posts computed on the shards."""
+    for agent in agents.values():
+        agent.current_upvotes = []
+
+    posts = {}
+    for node, (post, state) in pool.run("posts", config, agents, progress_bar=progress_bar).items():
+        restore_agent_state(agents[node], state)
+        posts[node] = sys.intern(post)
+    record_posts(agents, posts, global_posts, post_upvotes, post_cocktail_scores)
+
+def sharded_interact_with_posts(pool, config, agents, global_posts, post_upvotes, generation_data, progress_bar=None,
+                                feed_size=None, feed_policy="random", batch_size=None, rng=None) -> None:
+    """`processing.interact_with_posts` with the feeds built here and the decisions made on the shards."""
+    feeds = build_feeds(agents, global_posts, feed_size, feed_policy, rng)
+    decisions = pool.run("interact", config, agents, feeds, progress_bar, batch_size)
+    apply_interactions(agents, decisions, post_upvotes, generation_data)
\ No newline at end of file
@@ -1,36 +1,97 @@
-import json
-import streamlit as st
+import numpy as np
 from tqdm import tqdm
 from processing import generate_posts, interact_with_posts, store_generation_data
-
-def run_simulation(agents, generations, output_file, initial_social_circle, is_streamlit=False) -> None:
-    """Runs the social network simulation for multiple generations with both Streamlit and tqdm progress tracking."""
-
-    output_path = f"data/{output_file}.json"
+from utils import begin_generation, configure_llm
+from storage import initial_generation, last_generation, open_writer
+from network import initialise_simulation
+from checkpoint import load_checkpoint, restore_checkpoint, save_checkpoint
+from metrics import MetricsWriter
+from sharding import ShardPool, sharded_generate_posts, sharded_interact_with_posts
+
+def output_filename(config, include_seed=False, tag=None) -> str:
+    """Name of a run's output (under data/), built from the parameters that distinguish runs (plus an optional `tag`)."""
+    output_file = (
+        f"simulation_{config['num_agents']}agents_{config['generations']}gens_"
+        f"{config['llm_model'].replace('.', '_')}_"
+        f"{config['network_structure']}_{config['topic'].replace(' ', '_')}_"
+        f"VLU{config['VLU_fraction']}_explore{config['exploration_prob']}_"
+        f"temp{config['temperature']}"
+    )
+    if include_seed:
+        output_file += f"_seed{config.get('seed')}"
+    if tag:
+        output_file += f"_{tag}"
+    return output_file + ".json"
+
+def run_simulation(agents, generations, output_file, initial_social_circle, is_streamlit=False, config=None, checkpoint=None,
+                   progress_callback=None) -> None:
+    """Runs the social network simulation for multiple generations with both Streamlit and tqdm progress tracking.
+
+    With a `checkpoint` (see `resume_simulation`) the agents are restored and the run continues
+    after the checkpointed generation, appending to the existing output. `progress_callback(step, total, message)`
+    is called after each phase of a generation (e.g. by a background job, which cannot touch the Streamlit UI).
+    """
+
+    config = config or {}
+    max_workers = config.get("max_workers", 1)  # Agents generating posts / deciding on their feeds concurrently
+    feed_size = config.get("feed_size")  # None sends every visible post to the agent
+    feed_policy = config.get("feed_policy", "random")
+    feed_batch_size = config.get("feed_batch_size")
+    seed = config.get("seed")  # Seeds each generation's exposure sampling; None draws fresh entropy
+    save_checkpoints = config.get("checkpoint", True)  # Write data/<output_file>.ckpt after every generation
+    shards = config.get("shards")  # Run each phase as this many tasks on worker processes (see sharding.py)
+
+    configure_llm(config)  # Response cache, stub and rate limits
+
+    start_generation = 0
+    if checkpoint is not None:
+        restore_checkpoint(agents, checkpoint)
+        start_generation, seed = checkpoint["generation"], checkpoint["seed"]
+    elif seed is None:
+        seed = np.random.SeedSequence().entropy  # Kept in the checkpoint so a resumed run continues the same streams
+
+    output_format = config.get("output_format", "json")  # "json", "jsonl" or "parquet"
+    writer = open_writer(output_file, output_format, config.get("keyframe_interval", 10),
+                         checkpoint["output_offset"] if checkpoint is not None else None)
+    output_path = writer.path
+    follow_graph = next(iter(agents.values())).follow_graph
+
+    # Polarisation and echo-chamber measures, one row per generation in data/<output_file>.metrics.csv
+    metrics_writer = MetricsWriter(output_file, start_generation if checkpoint is not None else None) if config.get("metrics", True) else None
 
     # Initialize progress bars
     if is_streamlit:
+        import streamlit as st  # Only loaded for the app
+
         st.write("### Running Simulation...")
         progress_bar = st.progress(0)  # Streamlit progress bar
         status_text = st.empty()  # Placeholder for status messages
     else:
-        progress_bar = tqdm(total=generations * len(agents) * 2, desc="Simulation Progress", unit="task", leave=True)
+        progress_bar = tqdm(total=generations * len(agents) * 2, initial=start_generation * len(agents) * 2,
+                            desc="Simulation Progress", unit="task", leave=True)
 
-    with open(output_path, "w", encoding="utf-8") as file:
-        file.write("[\n")
+    pool = None
+    if shards:
+        pool = ShardPool(config.get("shard_queue") or f"data/queue/{output_file}", shards,
+                         config.get("shard_workers"), config.get("shard_lease", 600))
+
+    try:
+        if pool:
+            pool.start()
 
         # Store initial network structure
-        json.dump({"Generation 0": {str(node): {
-            "role": agents[node].role,
-            "persona": agents[node].persona,
-            "social_circle": initial_social_circle[node]
-        } for node in agents}}, file, indent=4)
-        file.write(",\n")
+        if checkpoint is None:
+            writer.write_generation(0, initial_generation(agents, initial_social_circle), follow_graph)
+            if metrics_writer:
+                metrics_writer.write_generation(0, agents, follow_graph)
+            if save_checkpoints:
+                save_checkpoint(output_file, 0, agents, follow_graph, writer, config, seed)
 
         total_steps = generations * len(agents) * 2
-        step_count = 0
+        step_count = start_generation * len(agents) * 2
 
-        for generation in range(generations):
+        for generation in range(start_generation, generations):
+            begin_generation(generation + 1)  # LLM occurrence counters are per generation
             status_message = f"**Generation {generation + 1} Processing...**"
 
             if is_streamlit:
@@ -43,7 +104,11 @@ def run_simulation(agents, generations, output_file, initial_social_circle, is_s
             global_posts, post_upvotes, post_cocktail_scores = {}, {}, {}
 
             # Step 1: Generate Posts
-            generate_posts(agents, global_posts, post_upvotes, post_cocktail_scores, progress_bar if not is_streamlit else None)
+            if pool:
+                sharded_generate_posts(pool, config, agents, global_posts, post_upvotes, post_cocktail_scores,
+                                       progress_bar if not is_streamlit else None)
+            else:
+                generate_posts(agents, global_posts, post_upvotes, post_cocktail_scores, progress_bar if not is_streamlit else None, max_workers)
 
             step_count += len(agents)
             if is_streamlit:
@@ -51,9 +116,18 @@ def run_simulation(agents, generations, output_file, initial_social_circle, is_s
                 status_text.write(f"✅ Generation {generation + 1}: Posts Generated")
             else:
                 progress_bar.update(len(agents))
+            if progress_callback:
+                progress_callback(step_count, total_steps, f"Generation {generation + 1}: Posts Generated")
 
             # Step 2: Interaction (Upvotes & Unfollows)
-            interact_with_posts(agents, global_posts, post_upvotes, generation_data, progress_bar if not is_streamlit else None)
+            if pool:
+                sharded_interact_with_posts(pool, config, agents, global_posts, post_upvotes, generation_data,
+                                            progress_bar if not is_streamlit else None, feed_size, feed_policy,
+                                            feed_batch_size, np.random.default_rng([seed, generation]))
+            else:
+                interact_with_posts(agents, global_posts, post_upvotes, generation_data, progress_bar if not is_streamlit else None,
+                                    feed_size, feed_policy, feed_batch_size,
+                                    np.random.default_rng([seed, generation]), max_workers)
 
             step_count += len(agents)
             if is_streamlit:
@@ -61,12 +135,19 @@ def run_simulation(agents, generations, output_file, initial_social_circle, is_s
                 status_text.write(f"✅ Generation {generation + 1}: Interactions Completed")
             else:
                 progress_bar.update(len(agents))
+            if progress_callback:
+                progress_callback(step_count, total_steps, f"Generation {generation + 1}: Interactions Completed")
 
             # Step 3: Store Data
-            store_generation_data(agents, global_posts, post_upvotes, post_cocktail_scores, generation_data)
+            # Only the JSON format stores every agent's full social circle; the others write edge deltas
+            store_generation_data(agents, global_posts, post_upvotes, post_cocktail_scores, generation_data,
+                                  include_social_circle=output_format == "json")
 
-            json.dump({f"Generation {generation + 1}": generation_data}, file, indent=4)
-            file.write(",\n" if generation < generations - 1 else "\n]")
+            writer.write_generation(generation + 1, generation_data, follow_graph)
+            if metrics_writer:
+                metrics_writer.write_generation(generation + 1, agents, follow_graph)
+            if save_checkpoints:
+                save_checkpoint(output_file, generation + 1, agents, follow_graph, writer, config, seed)
 
         if is_streamlit:
             progress_bar.progress(1.0)
@@ -75,4 +156,24 @@ def run_simulation(agents, generations, output_file, initial_social_circle, is_s
             print(f"Simulation results saved to {output_path}")
 
         if not is_streamlit:
-            progress_bar.close()  # Close tqdm in CLI mode
\ No newline at end of file
+            progress_bar.close()  # Close tqdm in CLI mode
+    finally:
+        if pool:
+            pool.close()
+        writer.close()
+        if metrics_writer:
+            metrics_writer.close()
+
+def resume_simulation(output_file, generations=None, is_streamlit=False, progress_callback=None) -> None:
+    """Continues a checkpointed run from its last completed generation (optionally up to more `generations`)."""
+    checkpoint = load_checkpoint(output_file)
+    config = checkpoint["config"]
+    generations = max(generations or config["generations"], checkpoint["generation"])
+    if checkpoint["generation"] >= generations and last_generation(output_file, config.get("output_format", "json")) == checkpoint["generation"]:
+        print(f"{output_file} already has {checkpoint['generation']} generations; nothing to resume.")
+        return
+    # Otherwise run on; a finished run killed before its output was closed only gets it closed
+
+    agents, initial_social_circle = initialise_simulation(config)
+    run_simulation(agents, generations, output_file, initial_social_circle, is_streamlit,
+                   {**config, "generations": generations}, checkpoint, progress_callback)
\ No newline at end of file
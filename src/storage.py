@@ -0,0 +1,425 @@
+import json
+import os
+import re
+import shutil
+from itertools import groupby
+import numpy as np
+from graph import FollowGraph
+
+# Generation records are split into three tables:
+# - agents: one row per agent per generation (role, persona, reflection, upvoted posts, explanations)
+# - posts:  one row per post per generation (author, text, upvotes received, whether it passed regulation)
+# - edges:  the follow graph, delta-encoded: every edge as "keyframe" rows in generation 0 and every
+#           `keyframe_interval` generations, otherwise only that generation's "follow"/"unfollow" rows
+TABLES = ("agents", "posts", "edges")
+
+def generation_rows(generation, generation_data) -> dict[str, list[dict]]:
+    """Splits one generation's {agent_id: record} data into agent and post rows (edges are encoded separately)."""
+    rows = {"agents": [], "posts": []}
+
+    for agent_id, record in generation_data.items():
+        agent_id = int(agent_id)
+        rows["agents"].append({
+            "generation": generation,
+            "agent_id": agent_id,
+            "role": record["role"],
+            "persona": record["persona"],
+            "reflection": record.get("reflection", ""),
+            "upvoted_posts": record.get("upvoted_posts", []),
+            "explanations": record.get("explanations", {}),
+        })
+        if "post" in record:
+            rows["posts"].append({
+                "generation": generation,
+                "author_id": agent_id,
+                "post": record["post"],
+                "upvotes_received": record["upvotes_received"],
+                "deadly_cocktail_score": record.get("deadly_cocktail_score", 0),
+            })
+            if "regulation_passed" in record:  # Regulated runs only
+                rows["posts"][-1]["regulation_passed"] = record["regulation_passed"]
+
+    return rows
+
+class EdgeDeltaEncoder:
+    """Turns successive follow-graph states into keyframe or follow/unfollow edge rows."""
+
+    def __init__(self, keyframe_interval=10):
+        self.keyframe_interval = keyframe_interval
+        self.previous = None  # (num_nodes, sorted edge keys) of the last written generation
+
+    def encode(self, generation, follow_graph) -> tuple[list[str], np.ndarray, np.ndarray]:
+        """Returns parallel (op, src, dst) columns for this generation."""
+        num_nodes, keys = follow_graph.num_nodes, follow_graph.edge_keys()
+        # An empty keyframe writes no rows, so a graph that lost every edge is recorded as unfollows instead
+        is_keyframe = self.previous is None or (self.keyframe_interval and generation % self.keyframe_interval == 0 and len(keys))
+
+        if is_keyframe:
+            ops, changed = ["keyframe"] * len(keys), keys
+        else:
+            followed = np.setdiff1d(keys, self.previous[1], assume_unique=True)
+            unfollowed = np.setdiff1d(self.previous[1], keys, assume_unique=True)
+            ops, changed = ["follow"] * len(followed) + ["unfollow"] * len(unfollowed), np.concatenate((followed, unfollowed))
+
+        self.previous = (num_nodes, keys)
+        return ops, changed // num_nodes, changed % num_nodes
+
+class EdgeReplay:
+    """Rebuilds the follow graph generation by generation from delta-encoded edge rows."""
+
+    def __init__(self):
+        self.edges = set()
+
+    def apply(self, rows) -> None:
+        for row in rows:
+            if row["op"] == "keyframe":
+                self.edges = {(edge["src"], edge["dst"]) for edge in rows}
+                return
+            if row["op"] == "follow":
+                self.edges.add((row["src"], row["dst"]))
+            else:
+                self.edges.discard((row["src"], row["dst"]))
+
+    def social_circles(self) -> dict[int, list[int]]:
+        social_circles = {}
+        for src, dst in sorted(self.edges):
+            social_circles.setdefault(src, []).append(dst)
+        return social_circles
+
+def generation_record(generation, tables, social_circles) -> dict[str, dict]:
+    """Rebuilds the {agent_id: record} shape of the JSON output from one generation's table rows."""
+    posts = {row["author_id"]: row for row in tables.get("posts", [])}
+    generation_data = {}
+
+    for row in tables["agents"]:
+        agent_id = row["agent_id"]
+        record = {"role": row["role"], "persona": row["persona"]}
+
+        if generation > 0:
+            post = posts.get(agent_id, {})
+            record.update({
+                "post": post.get("post", ""),
+                "upvotes_received": post.get("upvotes_received", 0),
+                "deadly_cocktail_score": post.get("deadly_cocktail_score", 0),
+                "upvoted_posts": row["upvoted_posts"],
+                "reflection": row["reflection"],
+            })
+        record["social_circle"] = social_circles.get(agent_id, [])
+        if generation > 0:
+            record["explanations"] = row["explanations"]
+            if post.get("regulation_passed") is not None:
+                record["regulation_passed"] = post["regulation_passed"]
+
+        generation_data[str(agent_id)] = record
+
+    return generation_data
+
+def initial_generation(agents, initial_social_circle) -> dict[str, dict]:
+    """Generation 0: roles, personas and the starting network."""
+    return {str(node): {
+        "role": agents[node].role,
+        "persona": agents[node].persona,
+        "social_circle": initial_social_circle[node]
+    } for node in agents}
+
+class JSONWriter:
+    """The original format: one pretty-printed JSON array with an object per generation (full social circles)."""
+
+    def __init__(self, output_file, keyframe_interval=None, resume_from=None):
+        self.path = f"data/{output_file}.json"
+        if resume_from is None:
+            self.file = open(self.path, "w", encoding="utf-8")
+            self.file.write("[\n")
+            self.is_first = True
+        else:  # Drop anything written after the checkpointed generation (e.g. the closing bracket)
+            self.file = open(self.path, "r+", encoding="utf-8")
+            self.file.seek(resume_from)
+            self.file.truncate()
+            self.is_first = False
+
+    def write_generation(self, generation, generation_data, follow_graph) -> None:
+        if not self.is_first:
+            self.file.write(",\n")
+        json.dump({f"Generation {generation}": generation_data}, self.file, indent=4)
+        self.is_first = False
+        self.file.flush()
+
+    def offset(self) -> int:
+        """Position after the last complete generation, stored in checkpoints."""
+        return self.file.tell()
+
+    def close(self) -> None:
+        self.file.write("\n]")
+        self.file.close()
+
+class JSONLWriter:
+    """Streams one JSON object per row into `data/<output_file>.<table>.jsonl`."""
+
+    def __init__(self, output_file, keyframe_interval=10, resume_from=None):
+        self.path = f"data/{output_file}.*.jsonl"
+        self.files = {}
+        for table in TABLES:
+            path = f"data/{output_file}.{table}.jsonl"
+            if resume_from is None:
+                self.files[table] = open(path, "w", encoding="utf-8")
+            else:
+                self.files[table] = open(path, "r+", encoding="utf-8")
+                self.files[table].seek(resume_from[table])
+                self.files[table].truncate()
+        # After a resume the encoder has no previous state, so the next generation is written as a keyframe
+        self.edge_encoder = EdgeDeltaEncoder(keyframe_interval)
+
+    def write_generation(self, generation, generation_data, follow_graph) -> None:
+        for table, rows in generation_rows(generation, generation_data).items():
+            self.files[table].writelines(json.dumps(row, ensure_ascii=False) + "\n" for row in rows)
+
+        ops, src, dst = self.edge_encoder.encode(generation, follow_graph)
+        self.files["edges"].writelines(
+            f'{{"generation": {generation}, "op": "{op}", "src": {s}, "dst": {d}}}\n'
+            for op, s, d in zip(ops, src.tolist(), dst.tolist())
+        )
+
+        for file in self.files.values():
+            file.flush()
+
+    def offset(self) -> dict[str, int]:
+        return {table: file.tell() for table, file in self.files.items()}
+
+    def close(self) -> None:
+        for file in self.files.values():
+            file.close()
+
+class ParquetWriter:
+    """Writes each generation of a table as its own part file, `data/<output_file>.<table>.parquet/gen-NNNNN.parquet` (needs pyarrow).
+
+    A part is written to a hidden temporary file and renamed into place, so a killed process
+    loses at most the generation in flight and every directory stays readable with
+    `pq.read_table` / `pq.ParquetDataset`. Resuming deletes the parts after the checkpoint.
+    """
+
+    def __init__(self, output_file, keyframe_interval=10, resume_from=None):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as error:
+            raise ImportError("The 'parquet' output format requires pyarrow (pip install pyarrow).") from error
+
+        self.pa, self.pq = pa, pq
+        self.path = f"data/{output_file}.*.parquet"
+        self.schemas = {
+            "agents": pa.schema([("generation", pa.int32()), ("agent_id", pa.int32()), ("role", pa.string()),
+                                 ("persona", pa.string()), ("reflection", pa.string()),
+                                 ("upvoted_posts", pa.string()), ("explanations", pa.string())]),
+            "posts": pa.schema([("generation", pa.int32()), ("author_id", pa.int32()), ("post", pa.string()),
+                                ("upvotes_received", pa.int32()), ("deadly_cocktail_score", pa.float64()),
+                                ("regulation_passed", pa.bool_())]),
+            "edges": pa.schema([("generation", pa.int32()), ("op", pa.string()), ("src", pa.int32()), ("dst", pa.int32())]),
+        }
+        if resume_from is not None and not isinstance(resume_from, int):
+            raise ValueError(f"The checkpoint of {output_file} refers to a single-file Parquet output, which cannot be resumed; start the run again.")
+
+        self.dirs = {table: f"data/{output_file}.{table}.parquet" for table in TABLES}
+        for path in self.dirs.values():
+            if resume_from is None:
+                if os.path.isdir(path):
+                    shutil.rmtree(path)
+                elif os.path.exists(path):  # Single-file output of an earlier version
+                    os.remove(path)
+            os.makedirs(path, exist_ok=True)
+            for name in os.listdir(path):  # Parts after the checkpoint and temporary files of a killed run
+                if name.startswith(".") or (resume_from is not None and name.startswith("gen-") and _part_generation(name) > resume_from):
+                    os.remove(os.path.join(path, name))
+        self.generation = resume_from
+        self.edge_encoder = EdgeDeltaEncoder(keyframe_interval)
+
+    def _write(self, table, generation, arrow_table) -> None:
+        path = os.path.join(self.dirs[table], f"gen-{generation:05d}.parquet")
+        temporary = os.path.join(self.dirs[table], f".gen-{generation:05d}.parquet.tmp")
+        with open(temporary, "wb") as file:
+            self.pq.write_table(arrow_table, file)
+            file.flush()
+            os.fsync(file.fileno())  # The checkpoint written after this generation refers to it
+        os.replace(temporary, path)
+
+    def write_generation(self, generation, generation_data, follow_graph) -> None:
+        for table, rows in generation_rows(generation, generation_data).items():
+            if not rows:
+                continue
+            if table == "agents":  # Nested values are kept as JSON strings
+                rows = [{**row, "upvoted_posts": json.dumps(row["upvoted_posts"], ensure_ascii=False),
+                         "explanations": json.dumps(row["explanations"], ensure_ascii=False)} for row in rows]
+            self._write(table, generation, self.pa.Table.from_pylist(rows, schema=self.schemas[table]))
+
+        ops, src, dst = self.edge_encoder.encode(generation, follow_graph)
+        if ops:
+            self._write("edges", generation, self.pa.table({
+                "generation": np.full(len(ops), generation, dtype=np.int32), "op": ops,
+                "src": src.astype(np.int32), "dst": dst.astype(np.int32)
+            }, schema=self.schemas["edges"]))
+        self.generation = generation
+
+    def offset(self) -> int:
+        """Last generation written (resuming drops every later part)."""
+        return self.generation
+
+    def close(self) -> None:
+        pass  # Every part is complete once written
+
+OUTPUT_WRITERS = {
+    "json": JSONWriter,
+    "jsonl": JSONLWriter,
+    "parquet": ParquetWriter,
+}
+
+def open_writer(output_file, output_format="json", keyframe_interval=10, resume_from=None):
+    """Returns the writer for `output_format` ("json", "jsonl" or "parquet").
+
+    `resume_from` is a writer `offset()` from a checkpoint: the existing output is truncated
+    back to it and new generations are appended.
+    """
+    if output_format not in OUTPUT_WRITERS:
+        raise ValueError(f"Output format '{output_format}' not recognised. Choose from {list(OUTPUT_WRITERS)}.")
+    return OUTPUT_WRITERS[output_format](output_file, keyframe_interval, resume_from)
+
+def _grouped(rows):
+    """Groups a generation-ordered row stream into (generation, rows) pairs."""
+    for generation, group in groupby(rows, key=lambda row: row["generation"]):
+        yield generation, list(group)
+
+def _jsonl_rows(path):
+    if not os.path.exists(path):
+        return
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            yield json.loads(line)
+
+def _part_generation(name) -> int:
+    """Generation of a Parquet part file ("gen-00037.parquet" -> 37)."""
+    return int(os.path.basename(name)[len("gen-"):-len(".parquet")])
+
+def _parquet_parts(path) -> list[str]:
+    """A Parquet table's part files in generation order (a single file for outputs of earlier versions)."""
+    if os.path.isfile(path):
+        return [path]
+    if not os.path.isdir(path):
+        return []
+    names = [name for name in os.listdir(path) if name.startswith("gen-") and name.endswith(".parquet")]
+    return [os.path.join(path, name) for name in sorted(names, key=_part_generation)]
+
+def _parquet_rows(path, parts=None):
+    import pyarrow.parquet as pq
+
+    for part in _parquet_parts(path) if parts is None else parts:
+        parquet_file = pq.ParquetFile(part)
+        for idx in range(parquet_file.num_row_groups):
+            for row in parquet_file.read_row_group(idx).to_pylist():
+                if "upvoted_posts" in row:
+                    row["upvoted_posts"] = json.loads(row["upvoted_posts"])
+                    row["explanations"] = json.loads(row["explanations"])
+                yield row
+
+def _table_streams(output_file, output_format) -> dict:
+    row_reader = {"jsonl": _jsonl_rows, "parquet": _parquet_rows}[output_format]
+    return {table: _grouped(row_reader(f"data/{output_file}.{table}.{output_format}")) for table in TABLES}
+
+def _tail(path, size) -> bytes:
+    with open(path, "rb") as file:
+        file.seek(max(0, os.path.getsize(path) - size))
+        return file.read()
+
+def last_generation(output_file, output_format="json"):
+    """Last generation fully written to a closed output, or None if it is missing, empty or was cut off mid-write.
+
+    Only the end of the file is read (Parquet: the part file names), so this is cheap for any run size.
+    """
+    if output_format == "json":
+        path = f"data/{output_file}.json"
+        if not os.path.exists(path) or not _tail(path, 16).rstrip().endswith(b"]"):
+            return None
+        size = 1 << 16
+        while True:  # The last generation object can be large: widen the window until its key is in it
+            matches = re.findall(rb'\{\s*"Generation (\d+)":', _tail(path, size))
+            if matches or size >= os.path.getsize(path):
+                return int(matches[-1]) if matches else None
+            size *= 16
+
+    path = f"data/{output_file}.agents.{output_format}"
+    if not os.path.exists(path):
+        return None
+    if output_format == "jsonl":
+        lines = _tail(path, 1 << 20).splitlines()
+        try:
+            return json.loads(lines[-1])["generation"] if lines else None
+        except json.JSONDecodeError:  # Last row only partly written
+            return None
+
+    if os.path.isdir(path):  # Parts are renamed into place whole, so the last one is complete
+        parts = _parquet_parts(path)
+        return _part_generation(parts[-1]) if parts else None
+
+    import pyarrow.parquet as pq
+
+    try:  # Single-file output of an earlier version
+        metadata = pq.ParquetFile(path).metadata
+    except Exception:  # No footer yet: the writer was never closed
+        return None
+    if not metadata.num_row_groups:
+        return None
+    return pq.ParquetFile(path).read_row_group(metadata.num_row_groups - 1, columns=["generation"])["generation"][-1].as_py()
+
+def read_generations(output_file, output_format="json"):
+    """Yields ("Generation N", {agent_id: record}) pairs one generation at a time, for any output format."""
+    if output_format == "json":
+        with open(f"data/{output_file}.json", "r", encoding="utf-8") as file:
+            for entry in json.load(file):
+                yield from entry.items()
+        return
+
+    streams = _table_streams(output_file, output_format)
+    pending = {table: next(streams[table], None) for table in ("posts", "edges")}
+    replay = EdgeReplay()
+
+    for generation, agent_rows in streams["agents"]:
+        tables = {"agents": agent_rows}
+        for table in ("posts", "edges"):
+            if pending[table] is not None and pending[table][0] == generation:
+                tables[table] = pending[table][1]
+                pending[table] = next(streams[table], None)
+
+        replay.apply(tables.get("edges", []))
+        yield f"Generation {generation}", generation_record(generation, tables, replay.social_circles())
+
+def _is_keyframe(part) -> bool:
+    """Whether an edges part holds a keyframe (a generation is either all "keyframe" rows or all deltas)."""
+    import pyarrow.parquet as pq
+
+    return pq.ParquetFile(part).read_row_group(0, columns=["op"])["op"][0].as_py() == "keyframe"
+
+def read_graph(output_file, generation, num_nodes, output_format="jsonl") -> FollowGraph:
+    """Reconstructs the follow graph of one generation.
+
+    Parquet reads only the edge parts from the last keyframe at or before `generation`; JSON Lines
+    (and single-file Parquet from earlier versions) has no index, so its edge rows are replayed from generation 0.
+    """
+    if output_format == "json":
+        for label, generation_data in read_generations(output_file, output_format):
+            if label == f"Generation {generation}":
+                return FollowGraph.from_adjacency(num_nodes, {int(node): record["social_circle"] for node, record in generation_data.items()})
+        raise KeyError(f"Generation {generation} not found in {output_file}")
+
+    path = f"data/{output_file}.edges.parquet"
+    if output_format == "parquet" and os.path.isdir(path):
+        parts = [part for part in _parquet_parts(path) if _part_generation(part) <= generation]
+        start = next((idx for idx in range(len(parts) - 1, -1, -1) if _is_keyframe(parts[idx])), 0)
+        edge_groups = _grouped(_parquet_rows(path, parts[start:]))
+    else:
+        edge_groups = _table_streams(output_file, output_format)["edges"]
+
+    replay = EdgeReplay()
+    for edge_generation, rows in edge_groups:
+        if edge_generation > generation:
+            break
+        replay.apply(rows)
+
+    src, dst = zip(*replay.edges) if replay.edges else ((), ())
+    return FollowGraph.from_edges(num_nodes, src, dst)
\ No newline at end of file
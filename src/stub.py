@@ -0,0 +1,122 @@
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from scheduler import RateLimitError
+
+WORDS = (
+    "people community future rights freedom truth change voice stand together family safety law choice "
+    "power system media leaders government justice protect fight support listen debate facts honest real "
+    "enough tired time now history values respect trust fear hope generation country world everyone"
+).split()
+
+class StubLLM:
+    """Deterministic offline backend that answers every FuseNet prompt type with well-formed text.
+
+    Each response is drawn from a RNG seeded on (seed, generation and agent stream, prompt, occurrence), so a run is
+    reproducible regardless of call order. Latency is log-normal around `latency_mean` seconds and response
+    lengths are normal around `tokens_mean` words. A `rate_limit_prob` fraction of requests fails
+    with a 429-style `RateLimitError` before drawing, so retried runs produce the same text.
+    """
+
+    def __init__(self, seed=0, latency_mean=0.0, latency_sigma=0.5, tokens_mean=40, tokens_sigma=10, yes_prob=0.8,
+                 rate_limit_prob=0.0):
+        self.seed = seed
+        self.latency_mean = latency_mean
+        self.latency_sigma = latency_sigma
+        self.tokens_mean = tokens_mean
+        self.tokens_sigma = tokens_sigma
+        self.yes_prob = yes_prob
+        self.rate_limit_prob = rate_limit_prob
+        self._failures = random.Random(seed)
+        self.occurrences = {}
+        self._lock = threading.Lock()
+
+    def _rng(self, context, stream=None) -> random.Random:
+        digest = hashlib.sha256(context.encode("utf-8")).hexdigest()
+        if stream is not None:  # Each agent's calls form their own sequence, whatever the thread interleaving
+            digest = f"{stream}:{digest}"
+        with self._lock:
+            occurrence = self.occurrences.get(digest, 0)
+            self.occurrences[digest] = occurrence + 1
+        return random.Random(f"{self.seed}:{digest}:{occurrence}")
+
+    def _maybe_rate_limit(self) -> None:
+        if self.rate_limit_prob > 0:
+            with self._lock:
+                refused = self._failures.random() < self.rate_limit_prob
+            if refused:
+                raise RateLimitError("Stub rate limit (simulated 429)", retry_after=0.01)
+
+    def _sleep(self, rng) -> None:
+        if self.latency_mean > 0:
+            # Log-normal with the requested mean: exp(mu + sigma^2 / 2) == latency_mean
+            mu = math.log(self.latency_mean) - self.latency_sigma ** 2 / 2
+            time.sleep(rng.lognormvariate(mu, self.latency_sigma))
+
+    def _text(self, rng, tokens_mean=None, max_chars=None) -> str:
+        length = max(3, int(rng.gauss(tokens_mean or self.tokens_mean, self.tokens_sigma)))
+        text = " ".join(rng.choice(WORDS) for _ in range(length)).capitalize() + "."
+        return text[:max_chars].rstrip() if max_chars else text
+
+    def __call__(self, context, temperature=0.7, stream=None) -> str:
+        self._maybe_rate_limit()
+        rng = self._rng(context, stream)
+        self._sleep(rng)
+        return self._respond(rng, context)
+
+    def sample(self, context, temperature=0.7, n=1, stream=None) -> list[str]:
+        """`n` responses from one simulated request (like OpenAI's `n`), paying the latency once."""
+        self._maybe_rate_limit()
+        rngs = [self._rng(context, stream) for _ in range(n)]
+        self._sleep(rngs[0])
+        return [self._respond(rng, context) for rng in rngs]
+
+    def decide(self, context, num_posts, options, explanations=False, temperature=0.7, stream=None) -> str:
+        """Schema-constrained interaction decisions, as JSON {"<post index>": decision} (see `utils.decision_schema`)."""
+        self._maybe_rate_limit()
+        rng = self._rng(context, stream)
+        self._sleep(rng)
+        decisions = [rng.choice(list(options)) for _ in range(num_posts)]
+        if explanations:
+            return json.dumps({str(idx): {"decision": decision, "explanation": self._text(rng, tokens_mean=12)}
+                               for idx, decision in enumerate(decisions)})
+        return json.dumps({str(idx): decision for idx, decision in enumerate(decisions)})
+
+    def _respond(self, rng, context) -> str:
+        if "DECISIONS:" in context:  # Interaction phase
+            num_posts = len(re.findall(r"^\d+: ", context.split("Posts:", 1)[-1], flags=re.MULTILINE))
+            options = [0, 1, 2, 3] if "3: Upvote & Follow" in context else [0, 1, 2]
+            decisions = [rng.choice(options) for _ in range(num_posts)]
+            response = "DECISIONS:\n" + ",".join(map(str, decisions))
+            if "EXPLANATIONS:" in context:
+                labels = {0: "Ignore", 1: "Upvote", 2: "Unfollow" if len(options) == 3 else "Follow", 3: "Upvote & Follow"}
+                response += "\nEXPLANATIONS:\n" + "\n".join(
+                    f"{idx}: {labels[decision]}: {self._text(rng, tokens_mean=12)}" for idx, decision in enumerate(decisions)
+                )
+            return response
+
+        if "'<number>: yes'" in context:  # Regulation of several candidate posts
+            num_posts = len(re.findall(r"^\d+: ", context, flags=re.MULTILINE))
+            return "\n".join(f"{idx}: {'yes' if rng.random() < self.yes_prob else 'no'}" for idx in range(1, num_posts + 1))
+
+        if "'yes' or 'no'" in context:  # Regulation
+            return "yes" if rng.random() < self.yes_prob else "no"
+
+        if "Summarise my posting style" in context:  # Reflection
+            return f"{self._text(rng, tokens_mean=20)} {self._text(rng, tokens_mean=20)}"
+
+        post = self._text(rng, max_chars=280)  # Post generation
+        if "[TARGET GROUP]" in context:
+            post = f"[TARGET GROUP] must face [ACTION] now. {post}"[:280]
+        return post
+
+stub_llm = StubLLM()
+
+def configure_stub(**settings) -> None:
+    """Replaces the process-wide stub backend, e.g. `configure_stub(seed=1, latency_mean=0.5)`."""
+    global stub_llm
+    stub_llm = StubLLM(**settings)
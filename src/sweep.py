@@ -0,0 +1,177 @@
+"""
+Runs a grid of simulation configs in parallel, sharing one LLM concurrency budget.
+
+Usage (from the repository root):
+    python src/sweep.py --param VLU_fraction 0.2 0.5 0.8 --param seed 1 2 3
+    python src/sweep.py --grid sweeps/vlu_study.json --workers 16 --llm-concurrency 32
+
+A grid file holds {"base": {config overrides}, "grid": {key: [values]}}; `--param` entries are
+added to its grid. Each run's output name ends with its config hash, so points differing in any
+key get their own files. Runs whose output is already complete are skipped, interrupted runs are
+resumed from their checkpoint, and every run is recorded in data/sweep_index.json.
+"""
+import argparse
+import contextlib
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+BASE_CONFIG = {
+    "num_agents": 5,
+    "generations": 3,
+    "llm_model": "gpt-3.5-turbo",
+    "temperature": 0.7,
+    "topic": "abortion ban",
+    "has_persona": True,
+    "network_structure": "fully_connected",
+    "regulating": False,
+    "connection_prob": 1,
+    "k_neighbour": 10,
+    "rewiring_prob": 0,
+    "VLU_fraction": 0.8,
+    "exploration_prob": 0.2,
+    "provides_explanation": True,
+    "debug": False,
+    "seed": 42,
+    "max_workers": 8,
+    "output_format": "json",
+    "checkpoint": True
+}
+
+INDEX_PATH = "data/sweep_index.json"
+
+def parse_value(value):
+    """Command-line grid values are JSON (numbers, null, lists...) or plain strings."""
+    try:
+        return json.loads(value)
+    except json.JSONDecodeError:
+        return value
+
+def expand_grid(base, grid) -> list[dict]:
+    """One config per point of the cartesian product of the grid's value lists."""
+    keys = list(grid)
+    return [{**base, **dict(zip(keys, values))} for values in itertools.product(*(grid[key] for key in keys))]
+
+def init_worker(gate) -> None:
+    from utils import configure_llm_gate
+    configure_llm_gate(gate)
+
+def run_case(case) -> dict:
+    """Runs (or resumes) one config in a pool worker and returns its index entry."""
+    config, output_file, status = case
+
+    import utils
+    from network import initialise_simulation
+    from simulation import resume_simulation, run_simulation
+
+    usage_before = dict(utils.llm_usage)
+    start = time.perf_counter()
+    entry = {"output_file": output_file, "config": config}
+
+    try:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+            if status == "resume":
+                resume_simulation(output_file, config["generations"])
+            else:
+                agents, initial_social_circle = initialise_simulation(config)
+                run_simulation(agents, config["generations"], output_file, initial_social_circle, False, config)
+        entry["status"] = "resumed" if status == "resume" else "completed"
+    except Exception as error:
+        entry["status"] = "failed"
+        entry["error"] = f"{type(error).__name__}: {error}"
+        entry["traceback"] = traceback.format_exc()
+
+    entry["wall_time_s"] = round(time.perf_counter() - start, 3)
+    entry.update({key: utils.llm_usage[key] - usage_before[key] for key in utils.llm_usage})
+    return entry
+
+def write_index(entries, path=INDEX_PATH) -> None:
+    """Merges this sweep's entries into the index (keyed by output file) and rewrites it atomically.
+
+    A skipped run keeps the entry recorded when it actually ran.
+    """
+    index = {}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as file:
+            index = {entry["output_file"]: entry for entry in json.load(file)["runs"]}
+    index.update({entry["output_file"]: entry for entry in entries
+                  if entry["status"] != "skipped" or entry["output_file"] not in index})
+
+    with open(f"{path}.tmp", "w", encoding="utf-8") as file:
+        json.dump({"updated": time.strftime("%Y-%m-%d %H:%M:%S"), "runs": list(index.values())}, file, indent=4)
+    os.replace(f"{path}.tmp", path)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run a grid of FuseNet simulations in parallel.")
+    parser.add_argument("--grid", help='JSON file with {"base": {...}, "grid": {key: [values]}}')
+    parser.add_argument("--param", nargs="+", action="append", default=[], metavar=("KEY", "VALUE"),
+                        help="Grid axis, e.g. --param exploration_prob 0.1 0.2 (repeatable)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Simulations run at the same time")
+    parser.add_argument("--llm-concurrency", type=int, help="Max LLM requests in flight across all simulations")
+    parser.add_argument("--index", default=INDEX_PATH, help="Summary index of every run")
+    args = parser.parse_args()
+
+    base, grid = dict(BASE_CONFIG), {}
+    if args.grid:
+        with open(args.grid, "r", encoding="utf-8") as file:
+            spec = json.load(file)
+        base.update(spec.get("base", {}))
+        grid.update(spec.get("grid", {}))
+    for key, *values in args.param:
+        if not values:
+            parser.error(f"--param {key} needs at least one value")
+        grid[key] = [parse_value(value) for value in values]
+
+    from checkpoint import run_status
+    from jobs import config_hash
+    from simulation import output_filename
+
+    cases, entries, seen = [], [], set()
+    include_seed = "seed" in grid
+    for config in expand_grid(base, grid):
+        # The name only holds some parameters: the config hash keeps points that differ elsewhere apart
+        output_file = output_filename(config, include_seed, tag=config_hash(config))
+        if output_file in seen:  # The same point listed twice in the grid
+            continue
+        seen.add(output_file)
+        status = run_status(config, output_file)
+        if status == "completed":
+            entries.append({"output_file": output_file, "config": config, "status": "skipped"})
+        else:
+            cases.append((config, output_file, status))
+
+    print(f"{len(cases) + len(entries)} configs: {len(cases)} to run, {len(entries)} already complete")
+    write_index(entries, args.index)
+
+    context = multiprocessing.get_context("spawn")
+    with contextlib.ExitStack() as stack:
+        gate = None
+        if args.llm_concurrency:
+            gate = stack.enter_context(context.Manager()).BoundedSemaphore(args.llm_concurrency)
+
+        executor = stack.enter_context(ProcessPoolExecutor(
+            max_workers=max(1, min(args.workers, len(cases))), mp_context=context,
+            initializer=init_worker, initargs=(gate,)
+        ))
+        futures = [executor.submit(run_case, case) for case in cases]
+
+        failed = 0
+        for future in as_completed(futures):
+            entry = future.result()
+            write_index([entry], args.index)
+            failed += entry["status"] == "failed"
+            icon = "❌" if entry["status"] == "failed" else "✅"
+            print(f"{icon} {entry['output_file']}: {entry['status']} in {entry['wall_time_s']:.1f}s"
+                  f"{' (' + entry['error'] + ')' if 'error' in entry else ''}", flush=True)
+
+    print(f"Sweep index saved to {args.index}")
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,126 @@
+import contextlib
+import contextvars
+import json
 import os
-import spacy
-# import google.generativeai as genai
-from openai import OpenAI
-# from llamaapi import LlamaAPI
-from transformers import AutoModelForCausalLM, AutoTokenizer, pipeline
+import threading
+# Backend SDKs (openai, transformers, llamaapi, google.generativeai) are imported inside the branch that
+# needs them, so a run only pays for the backend its `llm_model` uses
+from registry import registry
+from cache import ResponseCache
+from scheduler import configure_scheduler, scheduler_for
+import stub
+
+SYSTEM_PROMPT = "You are a social media user."
+
+response_cache = None  # Set by `configure_cache`; None means every prompt reaches the backend
+
+llm_gate = contextlib.nullcontext()  # Bounds in-flight backend requests; `configure_llm_gate` shares one across processes
+
+# Name of the agent the current thread is calling the LLM for. Identical prompts are counted per stream, so
+# the stub's draws and the cache's occurrence keys do not depend on how concurrent agents interleave
+llm_stream = contextvars.ContextVar("llm_stream", default=None)
+llm_generation = 0  # Generation the current LLM calls belong to (see `begin_generation`)
+
+llm_usage = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "retries": 0}  # Estimated totals for this process
+_usage_lock = threading.Lock()
+
+@contextlib.contextmanager
+def agent_stream(node):
+    """Attributes the LLM calls made inside the block (on this thread) to agent `node`."""
+    token = llm_stream.set(node)
+    try:
+        yield
+    finally:
+        llm_stream.reset(token)
+
+def current_stream() -> str:
+    """The calling thread's occurrence-counter stream: "<generation>:<agent>", or "<generation>" outside any agent."""
+    node = llm_stream.get()
+    return f"{llm_generation}" if node is None else f"{llm_generation}:{node}"
+
+def begin_generation(generation) -> None:
+    """Scopes the stub's and the cache's occurrence counters to `generation` and clears the previous one's.
+
+    The generation is part of every stream, so prompts repeated in later generations still get
+    fresh draws and cache keys, while the counters only ever hold one generation's calls.
+    """
+    global llm_generation
+    llm_generation = generation
+    stub.stub_llm.occurrences.clear()
+    if response_cache is not None:
+        response_cache.occurrences.clear()
+
+def estimate_tokens(text) -> int:
+    """Rough token count (~4 characters per token for English text)."""
+    return max(1, len(text) // 4)
+
+def record_usage(context, *responses) -> None:
+    """Counts one request: its prompt plus every completion it returned."""
+    with _usage_lock:
+        llm_usage["calls"] += 1
+        llm_usage["prompt_tokens"] += estimate_tokens(SYSTEM_PROMPT) + estimate_tokens(context)
+        llm_usage["completion_tokens"] += sum(estimate_tokens(response) for response in responses)
+
+def count_retry(error) -> None:
+    with _usage_lock:
+        llm_usage["retries"] += 1
+
+def scheduled(context, llm_model, request, n=1) -> list[str]:
+    """Sends `request()` (one backend request returning `n` completions) through the model's scheduler.
+
+    The scheduler applies the configured RPM/TPM limits and adaptive concurrency, and retries rate
+    limits and transient errors with backoff; the `llm_gate` is held only while the request is in flight.
+    """
+    prompt_tokens = estimate_tokens(SYSTEM_PROMPT) + estimate_tokens(context)
+    return scheduler_for(llm_model).call(request, prompt_tokens, n, estimate_tokens, llm_gate, count_retry)
+
+def configure_cache(mode="off", path="data/llm_cache.sqlite", max_mb=512) -> None:
+    """Installs (or removes) the process-wide LLM response cache used by `generate_llm_response`."""
+    global response_cache
+    if response_cache is not None:
+        response_cache.close()
+    response_cache = None if mode == "off" else ResponseCache(path, mode, max_mb * 1024 ** 2)
+
+def configure_llm(config) -> None:
+    """Applies a run config's LLM settings to this process: response cache, stub and request scheduler."""
+    # "read_write" reuses responses from earlier runs; "replay" reruns a recorded simulation with no API calls
+    configure_cache(config.get("llm_cache", "off"), config.get("llm_cache_path", "data/llm_cache.sqlite"),
+                    config.get("llm_cache_max_mb", 512))
+    stub.configure_stub(**config.get("stub_llm", {}))  # Only used when llm_model is "stub"
+    # Per-model {"rpm", "tpm", "max_concurrency"} limits; every LLM call is paced, and retried on 429s and transient errors
+    configure_scheduler(config.get("rate_limits"), config.get("max_retries", 6))
+
+def configure_llm_gate(gate=None) -> None:
+    """Makes every backend request hold `gate` (e.g. a `multiprocessing.Manager().BoundedSemaphore`), or none."""
+    global llm_gate
+    llm_gate = contextlib.nullcontext() if gate is None else gate
+
+def llm_state() -> dict:
+    """Per-run LLM bookkeeping saved in checkpoints: usage totals.
+
+    Occurrence counters are not saved: checkpoints fall on generation boundaries, where
+    `begin_generation` clears them, so a resumed run gets the same cache keys and stub draws.
+    """
+    return {"usage": dict(llm_usage)}
+
+def restore_llm_state(state) -> None:
+    llm_usage.update(state["usage"])
+
+def load_local_model(model_name, trust_remote_code=False):
+    """Loads a Hugging Face causal LM once per process through the backend registry."""
+    def loader():
+        from transformers import AutoModelForCausalLM, AutoTokenizer, pipeline
+
+        tokenizer = AutoTokenizer.from_pretrained(model_name, trust_remote_code=trust_remote_code)
+        model = AutoModelForCausalLM.from_pretrained(model_name, trust_remote_code=trust_remote_code)
+        pipe = pipeline("text-generation", model=model, tokenizer=tokenizer)
+        return tokenizer, model, pipe
+
+    return registry.get_local_model(model_name, loader)
 
 def generate_llm_response(context, llm_model, temperature=0.7) -> str:
     """
-    Generates a response from the specified LLM model.
+    Generates a response from the specified LLM model, going through the response cache when one is configured.
     
     Supported models:
     - OpenAI GPT: "gpt-3.5-turbo", "gpt-4"
@@ -16,20 +129,170 @@ def generate_llm_response(context, llm_model, temperature=0.7) -> str:
     - Mistral: "mistral-7b" (via Hugging Face `transformers`)
     - ChatGLM: "chatglm-6b", "chatglm2-6b", "chatglm3-6b" (via Hugging Face)
     - Local Models (e.g., GPT-J, Falcon): Any Hugging Face model
+    - Stub: "stub" (offline, deterministic stand-in for benchmarking; see `stub.configure_stub`)
+    """
+    if response_cache is None:
+        response, = scheduled(context, llm_model, lambda: [call_backend(context, llm_model, temperature)])
+        record_usage(context, response)
+        return response
+
+    key = response_cache.key(llm_model, temperature, SYSTEM_PROMPT, context, current_stream())
+    response = response_cache.get(key)  # Raises CacheMissError in replay mode
+    if response is None:
+        response, = scheduled(context, llm_model, lambda: [call_backend(context, llm_model, temperature)])
+        record_usage(context, response)
+        response_cache.put(key, response)
+    return response
+
+def generate_llm_responses(context, llm_model, temperature=0.7, n=1) -> list[str]:
+    """Samples `n` responses to the same prompt, e.g. candidate posts to regulate together.
+
+    OpenAI models (and the stub) return all of them from a single request (`n`); other backends
+    are called `n` times. Each response is cached under its own key, so only the missing ones are requested.
     """
+    if n == 1:
+        return [generate_llm_response(context, llm_model, temperature)]
+    if response_cache is None:
+        return sample_backend(context, llm_model, temperature, n)
 
-    if "gpt" in llm_model.lower():  # OpenAI GPT Models
-        client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        response = client.chat.completions.create(
-            model=llm_model,
-            messages=[{"role": "system", "content": f"You are a social media user."},
-                      {"role": "user", "content": context}],
-            temperature=temperature
-        )
-        return response.choices[0].message.content
+    keys = [response_cache.key(llm_model, temperature, SYSTEM_PROMPT, context, current_stream()) for _ in range(n)]
+    responses = [response_cache.get(key) for key in keys]  # Raises CacheMissError in replay mode
+    missing = [idx for idx, response in enumerate(responses) if response is None]
+    if missing:
+        for idx, response in zip(missing, sample_backend(context, llm_model, temperature, len(missing))):
+            responses[idx] = response
+            response_cache.put(keys[idx], response)
+    return responses
+
+def sample_backend(context, llm_model, temperature=0.7, n=1) -> list[str]:
+    """Requests `n` responses from the backend, in one request where it supports it."""
+    if llm_model.lower().startswith("stub") or "gpt" in llm_model.lower():
+        if llm_model.lower().startswith("stub"):
+            responses = scheduled(context, llm_model, lambda: stub.stub_llm.sample(context, temperature, n, current_stream()), n)
+        else:
+            responses = scheduled(context, llm_model, lambda: openai_chat(context, llm_model, temperature, n), n)
+        record_usage(context, *responses)
+        return responses
+
+    responses = []
+    for _ in range(n):
+        responses.extend(scheduled(context, llm_model, lambda: [call_backend(context, llm_model, temperature)]))
+        record_usage(context, responses[-1])
+    return responses
+
+def openai_client():
+    from openai import OpenAI
+    return OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+def openai_chat(context, llm_model, temperature=0.7, n=1, response_format=None) -> list[str]:
+    client = registry.get_client("openai", openai_client)
+    response = client.chat.completions.create(
+        model=llm_model,
+        messages=[{"role": "system", "content": SYSTEM_PROMPT},
+                  {"role": "user", "content": context}],
+        temperature=temperature,
+        n=n,
+        **({"response_format": response_format} if response_format else {})
+    )
+    return [choice.message.content for choice in response.choices]
+
+def decision_schema(num_posts, options, explanations=False) -> dict:
+    """JSON schema with one required property per post index, each an integer restricted to `options`."""
+    decision = {"type": "integer", "enum": list(options)}
+    if explanations:
+        decision = {"type": "object", "properties": {"decision": decision, "explanation": {"type": "string"}},
+                    "required": ["decision", "explanation"], "additionalProperties": False}
+    return {"type": "object", "properties": {str(idx): decision for idx in range(num_posts)},
+            "required": [str(idx) for idx in range(num_posts)], "additionalProperties": False}
+
+def generate_llm_decisions(context, llm_model, temperature, num_posts, options, explanations=False) -> tuple[list[int], dict[int, str]]:
+    """One decision from `options` per post, decoded under constraints instead of parsed from free text.
+
+    OpenAI models answer with strict JSON-schema output, local Hugging Face models pick each decision
+    from the logits of the option digits only (no explanations), and the stub returns the same JSON.
+    Returns the decisions in post order and {post index: explanation}.
+    """
+    schema = decision_schema(num_posts, options, explanations)
+    system_prompt = f"{SYSTEM_PROMPT}\n[decisions] {json.dumps(schema, sort_keys=True)}"  # Keeps cached text- and schema-mode answers apart
+
+    def request():
+        return [call_structured_backend(context, llm_model, temperature, schema, num_posts, options, explanations)]
+
+    key = response_cache.key(llm_model, temperature, system_prompt, context, current_stream()) if response_cache is not None else None
+    response = response_cache.get(key) if key else None  # Raises CacheMissError in replay mode
+    if response is None:
+        response, = scheduled(context, llm_model, request)
+        record_usage(context, response)
+        if key:
+            response_cache.put(key, response)
+
+    answers = json.loads(response)
+    if explanations:
+        return ([int(answers[str(idx)]["decision"]) for idx in range(num_posts)],
+                {idx: answers[str(idx)]["explanation"].strip() for idx in range(num_posts)})
+    return [int(answers[str(idx)]) for idx in range(num_posts)], {}
+
+def call_structured_backend(context, llm_model, temperature, schema, num_posts, options, explanations=False) -> str:
+    """Sends a decision prompt to a backend that can constrain its output; returns the answers as JSON."""
+    if llm_model.lower().startswith("stub"):
+        return stub.stub_llm.decide(context, num_posts, options, explanations, temperature, current_stream())
+
+    elif "gpt" in llm_model.lower():
+        response_format = {"type": "json_schema", "json_schema": {"name": "decisions", "strict": True, "schema": schema}}
+        return openai_chat(context, llm_model, temperature, 1, response_format)[0]
+
+    elif "mistral" in llm_model.lower():
+        return json.dumps(local_decisions(load_local_model("mistralai/Mistral-7B-v0.1"), context, num_posts, options, temperature))
+
+    elif "chatglm" in llm_model.lower():
+        return json.dumps(local_decisions(load_local_model("THUDM/chatglm3-6b", trust_remote_code=True), context, num_posts, options, temperature))
+
+    else:
+        raise ValueError(f"Model '{llm_model}' does not support structured decisions. Use the \"text\" decision mode.")
+
+def local_decisions(local_model, context, num_posts, options, temperature=0.7) -> dict[str, int]:
+    """Decodes "0: d\n1: d\n..." one post at a time, sampling each d from the option digits' logits only.
+
+    The key/value cache is carried between posts, so each decision costs a single forward step over
+    the few tokens fed since the previous one.
+    """
+    import torch
+
+    tokenizer, model = local_model.tokenizer, local_model.model
+    option_ids = [tokenizer.encode(str(option), add_special_tokens=False)[-1] for option in options]
+
+    answers, past = {}, None
+    pending = f"{SYSTEM_PROMPT}\n{context}\nDecisions:\n0: "
+    with local_model.lock, torch.no_grad():
+        for idx in range(num_posts):
+            input_ids = tokenizer(pending, add_special_tokens=past is None, return_tensors="pt").input_ids.to(model.device)
+            output = model(input_ids=input_ids, past_key_values=past, use_cache=True)
+            past = output.past_key_values
+
+            logits = output.logits[0, -1, option_ids].float()
+            if temperature > 0:
+                choice = int(torch.multinomial(torch.softmax(logits / temperature, dim=-1), 1))
+            else:
+                choice = int(logits.argmax())
+            answers[str(idx)] = options[choice]
+            pending = f"{options[choice]}\n{idx + 1}: "
+    return answers
+
+def call_backend(context, llm_model, temperature=0.7) -> str:
+    """Sends a single prompt to the backend selected by `llm_model`."""
+
+    if llm_model.lower().startswith("stub"):  # Offline stand-in (no network)
+        return stub.stub_llm(context, temperature, current_stream())
+
+    elif "gpt" in llm_model.lower():  # OpenAI GPT Models
+        return openai_chat(context, llm_model, temperature)[0]
 
     elif "llama" in llm_model.lower():  # Meta's LLaMA Models (Local)
-        llm = LlamaAPI(os.getenv("LLAMA_API_KEY")) 
+        def llama_client():
+            from llamaapi import LlamaAPI
+            return LlamaAPI(os.getenv("LLAMA_API_KEY"))
+
+        llm = registry.get_client("llama", llama_client)
         api_request_json = {
             "model": llm_model,  
             "messages": [
@@ -42,25 +305,25 @@ def generate_llm_response(context, llm_model, temperature=0.7) -> str:
 
 
     elif "gemini" in llm_model.lower():  # Google's Gemini Models
-        genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-        model = genai.GenerativeModel(llm_model)  # "gemini-pro"
+        def gemini_client():
+            import google.generativeai as genai
+            genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+            return genai.GenerativeModel(llm_model)  # "gemini-pro"
+
+        model = registry.get_client(f"gemini:{llm_model}", gemini_client)
         response = model.generate_content(context)
         return response.text
 
     elif "mistral" in llm_model.lower():  # Mistral Models (Hugging Face)
-        model_name = "mistralai/Mistral-7B-v0.1"
-        tokenizer = AutoTokenizer.from_pretrained(model_name)
-        model = AutoModelForCausalLM.from_pretrained(model_name)
-        pipe = pipeline("text-generation", model=model, tokenizer=tokenizer)
-        output = pipe(context, max_length=100)
+        local_model = load_local_model("mistralai/Mistral-7B-v0.1")
+        with local_model.lock:
+            output = local_model.pipeline(context, max_length=100)
         return output[0]["generated_text"]
 
     elif "chatglm" in llm_model.lower():  # ChatGLM Models (THUDM)
-        model_name = "THUDM/chatglm3-6b"  # or "THUDM/chatglm2-6b"
-        tokenizer = AutoTokenizer.from_pretrained(model_name)
-        model = AutoModelForCausalLM.from_pretrained(model_name, trust_remote_code=True)
-        pipe = pipeline("text-generation", model=model, tokenizer=tokenizer)
-        output = pipe(context, max_length=100)
+        local_model = load_local_model("THUDM/chatglm3-6b", trust_remote_code=True)  # or "THUDM/chatglm2-6b"
+        with local_model.lock:
+            output = local_model.pipeline(context, max_length=100)
         return output[0]["generated_text"]
 
     else:
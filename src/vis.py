@@ -1,120 +1,141 @@
-import json
+import functools
+import multiprocessing
+import os
+import shutil
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
 import networkx as nx
 import gravis as gv
-import os
 import matplotlib.pyplot as plt
-import matplotlib.animation as animation
+from matplotlib.collections import LineCollection
 from matplotlib.offsetbox import OffsetImage, AnnotationBbox
+import numpy as np
+from PIL import Image
+from graph import FollowGraph
+from layout import cached_layouts
+from storage import read_generations
+
+def clean_emoji_code(emoji_pair) -> str:
+    """Replaces codes missing from older emoji sets (zero-width joiners, the bitcoin sign)."""
+    return emoji_pair.replace("-200D", "").replace("20BF", "1F4B0")
+
+def load_persona_emojis(path="data/personas.txt") -> dict[str, str]:
+    """{persona: emoji code pair} from the personas file (first line personas, second line emoji codes)."""
+    with open(path, "r") as f:
+        personas = f.readline().strip().split(", ")  # First line: Personas
+        emoji_pairs = f.readline().strip().split(", ")  # Second line: Unicode emoji codes (can be 1, 2, or 3 parts)
+
+    persona_emojis = {}
+    for persona, emoji_pair in zip(personas, emoji_pairs):
+        persona_emojis.setdefault(persona, emoji_pair)  # First occurrence wins, as with list.index
+    return persona_emojis
 
 def setup_emojis() -> list:    
     """Ensure all emojis are available by replacing newer emojis."""
-    with open("data/personas.txt", "r") as f:
-        f.readline()
-        raw_emoji_pairs = f.readline().strip().split(", ")  # Second line: Emoji pairs
-
-    cleaned_emoji_pairs = []
-    
-    for emoji_pair in raw_emoji_pairs:
-        cleaned_pair = emoji_pair.replace("-200D", "").replace("20BF", "1F4B0")
-        cleaned_emoji_pairs.append(cleaned_pair)
-
-    return cleaned_emoji_pairs
-
-def fused_network_interactive(output_file: str) -> str:
+    return [clean_emoji_code(emoji_pair) for emoji_pair in load_persona_emojis().values()]
+
+def _flatten_ids(social_circle) -> set[int]:
+    """Flattens nested lists and keeps the valid numeric ids as integers."""
+    flat_list = []
+    for item in social_circle:
+        for sub_item in item if isinstance(item, list) else [item]:
+            if isinstance(sub_item, (int, str)) and str(sub_item).isdigit():
+                flat_list.append(int(sub_item))
+    return set(flat_list)
+
+class GraphSequence:
+    """Per-generation mutual-follow graphs of one run, parsed once and shared by every renderer.
+
+    Attributes (index `i` is the i-th generation in the output):
+    - labels: "Generation N" per generation
+    - nodes: sorted agent ids; roles, personas, emoji_codes: per-agent lookups
+    - upvotes: cumulative upvotes received per agent id (array of length num_nodes) per generation
+    - posts: {agent_id: post} per generation
+    - edges: (k, 2) array of mutual follows (u < v) per generation
+    """
+
+    def __init__(self, output_file, output_format="json", personas_path="data/personas.txt"):
+        persona_emojis = load_persona_emojis(personas_path)
+        self.default_emoji = next(iter(persona_emojis.values()), "")
+
+        self.labels, self.upvotes, self.posts, self.edges = [], [], [], []
+        self.roles, self.personas, self.emoji_codes = {}, {}, {}
+        cumulative = {}
+
+        # Results are streamed one generation at a time
+        for label, agents_data in read_generations(output_file, output_format):
+            social_circles = {}
+            posts = {}
+            for agent_id, agent_info in agents_data.items():
+                agent_id = int(agent_id)
+                if agent_id not in self.roles:
+                    self.roles[agent_id] = agent_info.get("role", "")
+                    self.personas[agent_id] = agent_info.get("persona")
+                    self.emoji_codes[agent_id] = persona_emojis.get(agent_info.get("persona"))
+
+                cumulative[agent_id] = cumulative.get(agent_id, 0) + agent_info.get("upvotes_received", 0)
+                posts[agent_id] = agent_info.get("post")
+                social_circles[agent_id] = _flatten_ids(agent_info.get("social_circle", []))
+
+            num_nodes = max(max(social_circles, default=-1), max(self.roles, default=-1)) + 1
+            follow_graph = FollowGraph.from_adjacency(num_nodes, {
+                agent_id: [followed for followed in follows if followed in social_circles] for agent_id, follows in social_circles.items()
+            })
+
+            self.labels.append(label)
+            self.posts.append(posts)
+            self.edges.append(follow_graph.mutual_edges())
+            self.upvotes.append(cumulative.copy())
+
+        self.nodes = sorted(self.roles)
+        self.num_nodes = self.nodes[-1] + 1 if self.nodes else 0
+        self.upvotes = [np.array([upvotes.get(node, 0) for node in range(self.num_nodes)]) for upvotes in self.upvotes]
+        self.VLU_agents = {node for node, role in self.roles.items() if role == "VLU"}
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def emoji_text(self, node) -> str:
+        """The agent's emoji pair as characters ("❓" for unknown personas)."""
+        if self.emoji_codes[node] is None:
+            return "❓"
+        return "".join(chr(int(code, 16)) for code in self.emoji_codes[node].split("-"))
+
+    def emoji_image_codes(self, node) -> list[str]:
+        """Codes of the agent's emoji images (unknown personas fall back to the first persona's)."""
+        emoji_pair = self.emoji_codes[node] or self.default_emoji
+        return clean_emoji_code(emoji_pair).split("-")
+
+def fused_network_interactive(output_file: str, output_format: str = "json", sequence: GraphSequence = None) -> str:
     """Generate an HTML visualisation of the fused mutual follow network over generations."""
-    setup_emojis()
-
-    with open("data/personas.txt", "r") as f:
-        personas = f.readline().strip().split(", ")  # First line: Personas
-        emoji_pairs = f.readline().strip().split(", ")  # Second line: Unicode emoji codes
-
-    with open(f"data/{output_file}.json", 'r') as f:
-        raw_data = json.load(f)
-
-    data = {k: v for entry in raw_data for k, v in entry.items()}
-    generations = list(data.keys())
+    sequence = sequence or GraphSequence(output_file, output_format)
 
     network_list = []
-    VLU_agents = set()
-    cumulative_upvotes = {int(agent_id): 0 for agent_id in data[generations[0]]}
-
-    for i, gen in enumerate(generations):
+    for i in range(len(sequence)):
         G = nx.Graph(name=f"Generation {i}") 
-        agents_data = data[gen]
-        
-        for agent_id, agent_info in agents_data.items():
-            agent_id = int(agent_id)
-            
-            if agent_info.get("role", "") == "VLU":
-                VLU_agents.add(agent_id)
-            
-            cumulative_upvotes[agent_id] += agent_info.get("upvotes_received", 0)
-            
-            if agent_info["persona"] in personas:
-                persona_index = personas.index(agent_info["persona"])
-                emoji_codes = emoji_pairs[persona_index].split("-") 
-                emoji_code_text = "".join([chr(int(code, 16)) for code in emoji_codes])
-            else:
-                emoji_code_text = "❓" 
-
-            # Add node with attributes
+
+        for node in sequence.nodes:
+            upvotes = int(sequence.upvotes[i][node])
             G.add_node(
-                agent_id,
-                size=10 + (cumulative_upvotes[agent_id] * 0.5),
-                color="red" if agent_id in VLU_agents else "#87CEEB",
+                node,
+                size=10 + (upvotes * 0.5),
+                color="red" if node in sequence.VLU_agents else "#87CEEB",
                 hover=(
-                    f"Agent {agent_id}<br>"
-                    f"Persona: {agent_info.get('persona')} {emoji_code_text}<br>" 
-                    f"Agent Type: {agent_info.get('role')}<br>"
-                    f"Post: {agent_info.get('post')}<br>"
-                    f"Upvotes: {cumulative_upvotes[agent_id]}<br>"
+                    f"Agent {node}<br>"
+                    f"Persona: {sequence.personas[node]} {sequence.emoji_text(node)}<br>" 
+                    f"Agent Type: {sequence.roles[node]}<br>"
+                    f"Post: {sequence.posts[i].get(node)}<br>"
+                    f"Upvotes: {upvotes}<br>"
                 ),
-                id=str(agent_id)
+                id=str(node),
+                label=sequence.emoji_codes[node] or "❓"
             )
 
-        # Process edges (mutual follows)
-        def flatten_and_convert(social_circle):
-            """Flattens nested lists and converts valid numeric elements to integers."""
-            flat_list = []
-            
-            for item in social_circle:
-                if isinstance(item, list):  # If there's a nested list, extend it
-                    for sub_item in item:
-                        if isinstance(sub_item, (int, str)) and str(sub_item).isdigit():
-                            flat_list.append(int(sub_item))
-                elif isinstance(item, (int, str)) and str(item).isdigit():  # Ensure it's a valid integer
-                    flat_list.append(int(item))  # Convert only valid numbers
-
-            return set(flat_list)  # Convert to a set of integers
-
-        # Apply fix in `fused_network_gif()`
-        social_circles = {int(agent_id): flatten_and_convert(agent_info.get("social_circle", [])) for agent_id, agent_info in agents_data.items()}
-
-        for agent_id, follows in social_circles.items():
-            for followed_agent in follows:
-                if followed_agent in social_circles and agent_id in social_circles[followed_agent]:
-                    G.add_edge(agent_id, followed_agent)
+        G.add_edges_from(sequence.edges[i].tolist())  # Mutual follows
+        G.graph["label"] = f"Generation {i + 1}"  # Keep generation labels
 
         network_list.append(G)
 
-    print(network_list)
-    
-    for i, graph in enumerate(network_list, 1):
-        graph.graph["label"] = f"Generation {i}"  # Keep generation labels
-
-        # Iterate through nodes and assign emoji labels
-        for node in graph.nodes:
-            agent_info = data[generations[i-1]].get(str(node), {})  # Retrieve agent data
-            persona = agent_info.get("persona", "")
-            
-            if persona in personas:
-                persona_index = personas.index(persona)
-                emoji_label = emoji_pairs[persona_index]  
-            else:
-                emoji_label = "❓"
-
-            graph.nodes[node]["label"] = emoji_label
-
     fig = gv.d3(
         network_list,
         graph_height=800,
@@ -140,74 +161,118 @@ def fused_network_interactive(output_file: str) -> str:
     )
     
     html_file_path = f"results/interactive_{output_file}.html"
-    gv.d3(network_list, node_hover_neighborhood=True).export_html(html_file_path, overwrite=True)
+    fig.export_html(html_file_path, overwrite=True)
     print(f"Visualisation saved as {html_file_path}")
 
     return html_file_path
 
 
-def fused_network_gif(output_file: str, parameters_details: str) -> str:
-    """Generate a GIF animation of the fused mutual follow network over generations."""
-
-    setup_emojis()
-
-    with open("data/personas.txt", "r") as f:
-        personas = f.readline().strip().split(", ")  # First line: Personas
-        emoji_pairs = f.readline().strip().split(", ")  # Second line: Unicode emoji codes (can be 1, 2, or 3 parts)
-
-    with open(f"data/{output_file}.json", 'r') as f:
-        raw_data = json.load(f)
-
-    data = {k: v for entry in raw_data for k, v in entry.items()}
-    generations = list(data.keys())
-    num_generations = len(generations)
-
-    G_fixed = nx.Graph()
-    nodes = set()
-    edges_by_generation = []
-    VLU_agents = set()
-    cumulative_upvotes_by_gen = []
-    cumulative_upvotes = {int(agent_id): 0 for agent_id in data[generations[0]]}  # Track upvotes
-
-
-    # Track mutual follows
-    social_circles_by_gen = []
-    agent_emojis = {}
-
-    for gen in generations:
-        agents_data = data[gen]
-        social_circles = {int(agent_id): set(map(int, agent_info.get("social_circle", []))) for agent_id, agent_info in agents_data.items()}
-        social_circles_by_gen.append(social_circles)
-
-        edges = []
-        for agent_id, agent_info in agents_data.items():
-            agent_id = int(agent_id)
-            nodes.add(agent_id)
-
-            if agent_info.get("role", "") == "VLU":
-                VLU_agents.add(agent_id)
-
-            cumulative_upvotes[agent_id] += agent_info.get("upvotes_received", 0)
-
-            persona_index = personas.index(agent_info["persona"]) if agent_info["persona"] in personas else 0
-            emoji_full = emoji_pairs[persona_index].split("-")  # Full emoji code (can be 1, 2, or 3 parts)
-            
-            agent_emojis[agent_id] = emoji_full
-
-            # Check for mutual follows
-            for followed_agent in social_circles.get(agent_id, set()):
-                if followed_agent in social_circles and agent_id in social_circles[followed_agent]:  # Mutual follow check
-                    edges.append((agent_id, followed_agent))
-
-        edges_by_generation.append(edges)
-        cumulative_upvotes_by_gen.append(cumulative_upvotes.copy()) 
-
-
-    G_fixed.add_nodes_from(nodes)
-    # pos = nx.spring_layout(G_fixed, seed=42)  
-    pos = nx.kamada_kawai_layout(G_fixed)  # Fixed layout for all frames
+@functools.lru_cache(maxsize=None)
+def load_emoji_image(emoji_code):
+    """Reads an OpenMoji PNG from data/emojis once per process (None if missing)."""
+    img_path = os.path.abspath(f"data/emojis/{emoji_code}.png")
+    try:
+        return plt.imread(img_path)
+    except FileNotFoundError:
+        print(f"❌ Missing emoji image: {img_path}")
+        return None
+
+class FrameRenderer:
+    """Draws the network figure once, then per frame only updates node sizes, edges and the title."""
+
+    def __init__(self, spec):
+        self.spec = spec
+        self.fig, self.ax = plt.subplots(figsize=(10, 10))
+        positions = spec["positions"][0]  # (generations, nodes, 2): layouts can move between frames
+        self.shown = 0  # Frame whose positions the artists currently show
+
+        self.edges = LineCollection([], colors="gray", linewidths=1.0, zorder=1)
+        self.ax.add_collection(self.edges)
+        self.nodes = self.ax.scatter(positions[:, 0], positions[:, 1], s=500, zorder=2,
+                                     c=["red" if node in spec["VLU_agents"] else "skyblue" for node in spec["nodes"]])
+
+        self.emojis = []  # (row, left box, right box)
+        for row, ((x, y), emoji_codes) in enumerate(zip(positions, spec["emoji_codes"])):
+            images = [load_emoji_image(code) for code in emoji_codes]
+            if len(images) == 2 and all(image is not None for image in images):
+                left = AnnotationBbox(OffsetImage(images[0], zoom=0.25), (x - 0.03, y), frameon=False)  # Left emoji
+                right = AnnotationBbox(OffsetImage(images[1], zoom=0.25), (x + 0.03, y), frameon=False)  # Right emoji
+                self.ax.add_artist(left)
+                self.ax.add_artist(right)
+                self.emojis.append((row, left, right))
+
+        # Fixed limits over every frame so the view does not jump as the layout moves
+        lower, upper = spec["positions"].min(axis=(0, 1)), spec["positions"].max(axis=(0, 1))
+        margin = (upper - lower) * 0.05 + 0.05
+        self.ax.set_xlim(lower[0] - margin[0], upper[0] + margin[0])
+        self.ax.set_ylim(lower[1] - margin[1], upper[1] + margin[1])
+        self.ax.set_axis_off()
+        self.title = self.ax.set_title("")
+        self.fig.text(
+            0.5, 0.03, spec["caption"], wrap=True, horizontalalignment='center', fontsize=10,
+            bbox=dict(facecolor="white", edgecolor="none", boxstyle="round,pad=0.5")
+        )
 
-    fig, ax = plt.subplots(figsize=(10, 10))
+    def render(self, frame) -> np.ndarray:
+        """RGB pixels of one generation's frame."""
+        index, positions = self.spec["index"], self.spec["positions"][frame]
+        edges = self.spec["edges"][frame]
+        self.edges.set_segments(positions[index[edges]] if len(edges) else [])
+        if not np.array_equal(positions, self.spec["positions"][self.shown]):
+            self.shown = frame
+            self.nodes.set_offsets(positions)
+            for row, left, right in self.emojis:
+                x, y = positions[row]
+                left.xy = left.xybox = (x - 0.03, y)
+                right.xy = right.xybox = (x + 0.03, y)
+        self.nodes.set_sizes(500 + self.spec["upvotes"][frame][self.spec["nodes"]] * 10)
+        self.title.set_text(f'Mutual Follow Network — {self.spec["labels"][frame]}')
+
+        self.fig.canvas.draw()
+        return np.asarray(self.fig.canvas.buffer_rgba())[..., :3].copy()
+
+_worker_renderer = None
+
+def _init_frame_worker(spec) -> None:
+    global _worker_renderer
+    _worker_renderer = FrameRenderer(spec)
+
+def _render_frame(frame) -> np.ndarray:
+    return _worker_renderer.render(frame)
+
+def save_animation(frames, path, fps=1) -> None:
+    """Writes RGB frames as a looping GIF (Pillow) or, for a .mp4 path, an H.264 video (needs ffmpeg)."""
+    if path.endswith(".mp4"):
+        if shutil.which("ffmpeg") is None:
+            raise RuntimeError("MP4 animations require ffmpeg on the PATH.")
+        height, width = frames[0].shape[:2]
+        command = ["ffmpeg", "-y", "-loglevel", "error", "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{width}x{height}",
+                   "-r", str(fps), "-i", "-", "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2", "-pix_fmt", "yuv420p", path]
+        with subprocess.Popen(command, stdin=subprocess.PIPE) as ffmpeg:
+            for frame in frames:
+                ffmpeg.stdin.write(frame.tobytes())
+            ffmpeg.stdin.close()
+        if ffmpeg.returncode:
+            raise RuntimeError(f"ffmpeg exited with status {ffmpeg.returncode} while writing {path}")
+        return
+
+    images = [Image.fromarray(frame) for frame in frames]
+    images[0].save(path, save_all=True, append_images=images[1:], duration=int(1000 / fps), loop=0)
+
+def fused_network_gif(output_file: str, parameters_details: str, output_format: str = "json", sequence: GraphSequence = None,
+                      workers: int = 1, animation_format: str = "gif", layout_engine: str = "auto", warm_start: bool = True) -> str:
+    """Generate a GIF (or MP4) animation of the fused mutual follow network over generations.
+
+    Node positions come from `layout.cached_layouts` (see there for the engines); with `warm_start`
+    each generation's layout continues from the previous one. With `workers > 1` frames are
+    rendered in a process pool, each worker drawing the static parts of the figure once.
+    """
+    sequence = sequence or GraphSequence(output_file, output_format)
+
+    index = np.zeros(sequence.num_nodes, dtype=np.int64)  # Agent id -> row of `positions`
+    index[sequence.nodes] = np.arange(len(sequence.nodes))
+    positions = cached_layouts(output_file, len(sequence.nodes), [index[edges] for edges in sequence.edges],
+                               layout_engine, warm_start)
 
     caption_text = (
         "This animation visualises the evolution of a mutual follow network over multiple generations. "
@@ -216,55 +281,30 @@ def fused_network_gif(output_file: str, parameters_details: str) -> str:
         f"Over time, some agents unfollow others, causing shifts in the network structure.\n{parameters_details}"
     )
 
-    def get_emoji_image(emoji_codes, zoom=0.25):
-        """Fetch local emoji images based on OpenMoji Unicode codes (two per agent)."""
-        images = []
-        
-        for emoji_code in emoji_codes: 
-            img_path = os.path.abspath(f"data/emojis/{emoji_code}.png")
-            
-            try:
-                emoji_img = plt.imread(img_path)
-                images.append(OffsetImage(emoji_img, zoom=zoom))
-            except FileNotFoundError:
-                print(f"❌ Missing emoji image: {img_path}")
-
-        return images if images else None
-
-    def update(frame):
-        ax.clear()
-        G = nx.Graph()
-        G.add_nodes_from(nodes)  # Ensure all nodes exist
-        G.add_edges_from(edges_by_generation[frame])  # Apply edges for this generation
-
-        node_sizes = [500 + (cumulative_upvotes_by_gen[frame][node] * 10) for node in G.nodes()]
-        node_colors = ["red" if node in VLU_agents else "skyblue" for node in G.nodes()]
-        
-        nx.draw(G, pos, node_size=node_sizes, node_color=node_colors, edge_color='gray', font_size=12, ax=ax)
-
-        for node, (x, y) in pos.items():
-            if node in agent_emojis:
-                emoji_images = get_emoji_image(agent_emojis[node])  # Get both emoji images
-                
-                if emoji_images and len(emoji_images) == 2:
-                    ab1 = AnnotationBbox(emoji_images[0], (x - 0.03, y), frameon=False)  # Left emoji
-                    ab2 = AnnotationBbox(emoji_images[1], (x + 0.03, y), frameon=False)  # Right emoji
-                    
-                    ax.add_artist(ab1)
-                    ax.add_artist(ab2)
-
-
-        ax.set_title(f'Mutual Follow Network — {generations[frame]}')
-
-        fig.text(
-            0.5, 0.03, caption_text, wrap=True, horizontalalignment='center', fontsize=10,
-            bbox=dict(facecolor="white", edgecolor="none", boxstyle="round,pad=0.5")
-        )
-
-    ani = animation.FuncAnimation(fig, update, frames=num_generations, interval=1000, repeat=True)
-
-    gif_file_path = f"results/GIF_{output_file}.gif"
-    ani.save(gif_file_path, writer="pillow", fps=1)
+    spec = {
+        "nodes": np.array(sequence.nodes, dtype=np.int64),
+        "index": index,
+        "positions": positions,
+        "VLU_agents": sequence.VLU_agents,
+        "emoji_codes": [sequence.emoji_image_codes(node) for node in sequence.nodes],
+        "edges": sequence.edges,
+        "upvotes": sequence.upvotes,
+        "labels": sequence.labels,
+        "caption": caption_text,
+    }
+
+    if workers > 1 and len(sequence) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(sequence)), mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_init_frame_worker, initargs=(spec,)) as executor:
+            frames = list(executor.map(_render_frame, range(len(sequence))))
+    else:
+        renderer = FrameRenderer(spec)
+        frames = [renderer.render(frame) for frame in range(len(sequence))]
+        plt.close(renderer.fig)
+
+    extension = "mp4" if animation_format == "mp4" else "gif"
+    gif_file_path = f"results/{extension.upper()}_{output_file}.{extension}"
+    save_animation(frames, gif_file_path, fps=1)
     print(f"Animation saved as {gif_file_path}")
 
     return gif_file_path
\ No newline at end of file
@@ -0,0 +1,110 @@
+"""
+Stateless shard worker for sharded simulations (config "shards").
+
+Usage (from the repository root, on any machine that sees the queue directory):
+    python src/worker.py --queue data/queue/<output_file>
+
+The coordinator (`run_simulation`) starts `shard_workers` of these itself; extra workers on other
+machines can join by pointing at the same shared directory. Each task is one shard of one phase:
+the worker rebuilds the shard's agents from the config and their serialised state, runs the phase
+and publishes the results. Workers exit when the coordinator writes the queue's `stop` file.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+import traceback
+import stub
+import utils
+from checkpoint import agent_state, restore_agent_state
+from graph import FollowGraph
+from network import make_agent
+from processing import decide_interactions, generate_posts
+from sharding import FileQueue
+
+_configured = None  # LLM settings this process was last configured with
+
+def rebuild_agents(task) -> dict:
+    """The shard's agents, from the config plus each agent's role, persona and checkpoint-style state."""
+    config = task["config"]
+    follow_graph = FollowGraph(config["num_agents"])  # Posting and deciding never read the follow graph
+    agents = {}
+    for node, spec in task["agents"].items():
+        agent = make_agent(config, node, spec["role"], spec["persona"], follow_graph)
+        restore_agent_state(agent, spec["state"])
+        agents[node] = agent
+    return agents
+
+def run_task(task) -> dict:
+    global _configured
+    config = task["config"]
+    settings = json.dumps({key: config.get(key) for key in ("llm_cache", "llm_cache_path", "llm_cache_max_mb", "stub_llm",
+                                                             "rate_limits", "max_retries")}, sort_keys=True, default=str)
+    if settings != _configured:
+        utils.configure_llm(config)
+        _configured = settings
+
+    # Continue each agent's LLM counters from where the coordinator has them
+    utils.begin_generation(task["generation"])
+    stub.stub_llm.occurrences.update(task["counters"]["stub"])
+    if utils.response_cache is not None:
+        utils.response_cache.occurrences.update(task["counters"]["cache"])
+        utils.response_cache.deferred = []  # Only the coordinator writes the cache
+    usage_before = dict(utils.llm_usage)
+
+    agents = rebuild_agents(task)
+    max_workers = config.get("max_workers", 1)
+    if task["phase"] == "posts":
+        global_posts = {}
+        generate_posts(agents, global_posts, {}, {}, None, max_workers)
+        results = {node: (global_posts[node], agent_state(agent)) for node, agent in agents.items()}
+    elif task["phase"] == "interact":
+        results = decide_interactions(agents, task["feeds"], task["batch_size"], None, max_workers)
+    else:
+        raise ValueError(f"Unknown shard phase '{task['phase']}'.")
+
+    return {
+        "results": results,
+        "counters": {"stub": dict(stub.stub_llm.occurrences),
+                     "cache": dict(utils.response_cache.occurrences) if utils.response_cache is not None else {}},
+        "usage": {key: utils.llm_usage[key] - usage_before.get(key, 0) for key in utils.llm_usage},
+        "cache_entries": utils.response_cache.deferred if utils.response_cache is not None else [],
+        "error": None,
+    }
+
+def run_worker(queue_dir, lease=600, poll=0.05) -> None:
+    """Claims and runs tasks until the queue is stopped (or removed)."""
+    queue = FileQueue(queue_dir)
+    while os.path.isdir(queue_dir) and not queue.stopped():
+        claimed = queue.claim()
+        if claimed is None:
+            time.sleep(poll)
+            continue
+
+        task_id, task = claimed
+        done = threading.Event()
+
+        def heartbeat():
+            while not done.wait(lease / 3):
+                queue.heartbeat(task_id)
+
+        threading.Thread(target=heartbeat, daemon=True).start()
+        try:
+            result = run_task(task)
+        except Exception:
+            result = {"error": traceback.format_exc()}
+        finally:
+            done.set()
+        queue.complete(task_id, result)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run FuseNet shard tasks from a filesystem work queue.")
+    parser.add_argument("--queue", required=True, help="Queue directory shared with the coordinator")
+    parser.add_argument("--lease", type=float, default=600, help="Seconds after which the coordinator hands an unrefreshed task to another worker")
+    parser.add_argument("--poll", type=float, default=0.05, help="Seconds between checks for new tasks")
+    args = parser.parse_args()
+    run_worker(args.queue, args.lease, args.poll)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file